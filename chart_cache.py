@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+import threading
+from tushare_cache import CACHE_ROOT
+
+
+# 图表缓存的总大小上限（字节），超出时删除最久未使用的图表，可以通过环境变量CHART_CACHE_MAX_BYTES修改
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+
+
+class ChartCache:
+    def __init__(self, cache_dir=None, max_bytes=CHART_CACHE_MAX_BYTES):
+        """
+        K线图缓存
+        以(股票代码, 最后一个交易日, 绘图选项)为键保存已经编码好的图片，
+        同一只股票在同一交易日重复出现或重新运行时直接复用，不再调用matplotlib
+        """
+        self.cache_dir = cache_dir or os.path.join(CACHE_ROOT, 'charts')
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+        self._total_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir)
+                                if entry.name.endswith('.txt'))
+
+    def make_key(self, stock_code, last_trade_date, options):
+        """由股票代码、最后一个交易日和绘图选项生成缓存键"""
+        raw = json.dumps({'ts_code': stock_code, 'last_trade_date': str(last_trade_date), 'options': options},
+                         sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        """读取缓存的图片（data URI），未命中时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                image = f.read()
+            # 更新修改时间，淘汰时按最近使用排序
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+        return image
+
+    def set(self, key, image):
+        """写入图片，超出总大小上限时淘汰最久未使用的图表"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(image)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            if os.path.exists(path):
+                self._total_bytes -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近使用时间从旧到新删除，直到总大小回到上限的90%以下"""
+        entries = sorted((entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.txt')),
+                         key=lambda entry: entry.stat().st_mtime)
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self._stats['evicted'] += 1
+
+    def get_stats(self):
+        """返回命中、未命中和淘汰次数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self):
+        """打印图表缓存统计"""
+        stats = self.get_stats()
+        print(f"K线图缓存统计: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+              f"淘汰 {stats['evicted']} 张, 占用 {self._total_bytes / 1024 / 1024:.1f}MB")
+
+
+_default_chart_cache = None
+_default_chart_cache_lock = threading.Lock()
+
+
+def get_default_chart_cache():
+    """获取进程内共享的图表缓存"""
+    global _default_chart_cache
+    with _default_chart_cache_lock:
+        if _default_chart_cache is None:
+            _default_chart_cache = ChartCache()
+        return _default_chart_cache
@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from chart_cache import get_default_chart_cache
+
+
+# 渲染进程数，默认与CPU核数一致，可以通过环境变量CHART_WORKERS修改
+CHART_WORKERS = int(os.environ.get('CHART_WORKERS', os.cpu_count() or 1))
+
+
+def _init_worker():
+    """
+    渲染进程初始化：加载matplotlib后端和字体设置，创建K线图模板并先画一次，
+    让字体缓存、后端和图像布局在第一个任务到来之前就绪
+    """
+    from kline_generator import get_kline_template
+    get_kline_template().fig.canvas.draw()
+
+
+def _render_job(stock_code, company_name, data):
+    """在渲染进程中执行的单个K线图任务"""
+    from kline_generator import render_kline
+    return render_kline(data, stock_code, company_name)
+
+
+class ChartRenderFarm:
+    def __init__(self, max_workers=None, kline_generator=None, chart_cache=None):
+        """
+        K线图渲染进程池
+        matplotlib绘图是CPU密集型且受GIL限制，批量生成报告时把绘图任务交给多个进程并行执行，
+        报告生成阶段只需取回已经完成的图片；图表缓存中已有的图片不再提交
+        """
+        self.max_workers = max_workers or CHART_WORKERS
+        self._kline_generator = kline_generator
+        self.chart_cache = chart_cache or get_default_chart_cache()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, stock_code, company_name, data):
+        """提交一个已经准备好行情数据的绘图任务，返回Future"""
+        future = self._executor.submit(_render_job, stock_code, company_name, data)
+        with self._lock:
+            self._futures[stock_code] = future
+        return future
+
+    def submit_stock(self, stock_code, company_name):
+        """
+        读取股票行情后提交绘图任务，行情为空时返回None
+        图表缓存命中时直接返回已完成的Future，未命中时渲染完成后写入缓存
+        """
+        from kline_generator import KLineGenerator, chart_cache_key
+        if self._kline_generator is None:
+            self._kline_generator = KLineGenerator()
+        data = self._kline_generator.get_stock_data(stock_code)
+        if data.empty:
+            print(f"未能获取到 {stock_code} 的数据")
+            return None
+
+        key = chart_cache_key(self.chart_cache, stock_code, company_name, data)
+        image = self.chart_cache.get(key)
+        if image is not None:
+            future = Future()
+            future.set_result(image)
+            with self._lock:
+                self._futures[stock_code] = future
+            return future
+
+        future = self.submit(stock_code, company_name, data)
+        future.add_done_callback(lambda f: self._store(key, f))
+        return future
+
+    def _store(self, key, future):
+        """渲染成功的图片写入图表缓存"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            self.chart_cache.set(key, future.result())
+        except OSError as e:
+            print(f"K线图写入缓存失败: {e}")
+
+    def submit_all(self, stocks):
+        """批量提交，stocks为(股票代码, 公司名称)列表；单只股票读取行情失败不影响其他股票"""
+        for stock_code, company_name in stocks:
+            try:
+                self.submit_stock(stock_code, company_name)
+            except Exception as e:
+                print(f"提交 {company_name}({stock_code}) 的K线图任务失败: {e}")
+        print(f"已提交 {len(self._futures)} 个K线图渲染任务，渲染进程数: {self.max_workers}")
+
+    def get(self, stock_code):
+        """取出某只股票的绘图任务，没有提交过时返回None"""
+        with self._lock:
+            return self._futures.get(stock_code)
+
+    def shutdown(self):
+        """关闭进程池"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
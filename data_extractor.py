@@ -1,19 +1,22 @@
-import tushare as ts
 import pandas as pd
 import datetime
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
+from tushare_cache import CachedProApi
+from tushare_client import get_pro_api
+from financial_snapshot import get_default_snapshot, report_periods
+from trade_calendar import get_trade_calendar
+
+
+# 查找当日市场数据时最多回溯的交易日数（约30个自然日）
+MARKET_DATA_LOOKBACK_SESSIONS = 21
 
 
 class DataExtractor:
-    def __init__(self):
-        # 从环境变量获取tushare token
-        token = os.environ.get('TUSHARE_TOKEN')
-        if not token:
-            raise ValueError("TUSHARE_TOKEN环境变量未设置")
-        
-        ts.set_token(token)
-        self.pro = ts.pro_api()
+    def __init__(self, bulk_mode=False, max_workers=1):
+        # 通过本地缓存访问进程内共享的Tushare客户端，重复出现的股票不再重复请求
+        self.pro = CachedProApi(get_pro_api())
         
         # 计算时间范围
         self.current_date = datetime.datetime.now()
@@ -27,17 +30,83 @@ class DataExtractor:
         self.ten_quarters_ago_str = self.ten_quarters_ago.strftime('%Y%m%d')
         self.current_date_str = self.current_date.strftime('%Y%m%d')
         
+        # 原始报表缓冲区，每只股票每张报表只请求一次，年度、季度和主营业务视图都从中推算
+        self._statement_buffer = {}
+
+        # 并发提取的线程数，为1时按顺序提取
+        self.max_workers = max(1, int(max_workers))
+
+        # 批量模式：利润表、现金流量表、财务指标从全市场快照中切片，不再逐只股票请求
+        self.bulk_mode = bulk_mode
+        self.snapshot = None
+        if bulk_mode:
+            # 覆盖五年公告期所需的全部报告期（往前多取一年，公告日晚于报告期）
+            periods = report_periods(self.five_years_ago - datetime.timedelta(days=365), self.current_date)
+            self.snapshot = get_default_snapshot(self.pro, periods)
+
         #print(f"当前日期: {self.current_date_str}")
         #print(f"过去三年起始日期: {self.three_years_ago_str}")
         #print(f"过去五年起始日期: {self.five_years_ago_str}")
         #print(f"过去十个季度起始日期: {self.ten_quarters_ago_str}")
 
+    def _query_statement(self, endpoint, stock_code, start_date, end_date, fields=''):
+        """
+        查询利润表、现金流量表或财务指标
+        批量模式下从全市场快照中切片，否则直接按ts_code调用接口
+        """
+        if self.snapshot is not None:
+            return self.snapshot.slice(endpoint, stock_code, start_date, end_date, fields=fields)
+
+        return self.pro.query(endpoint, fields=fields, ts_code=stock_code,
+                              start_date=start_date, end_date=end_date)
+
+    def _get_raw_statement(self, endpoint, stock_code, fields=''):
+        """
+        获取过去五年公告的原始报表（合并报表，累计口径）
+        同一只股票的同一张报表只请求一次，之后直接读取缓冲区
+        """
+        key = (endpoint, stock_code)
+        if key not in self._statement_buffer:
+            self._statement_buffer[key] = self._query_statement(endpoint, stock_code,
+                                                                start_date=self.five_years_ago_str,
+                                                                end_date=self.current_date_str,
+                                                                fields=fields)
+        return self._statement_buffer[key]
+
+    def _single_quarter_view(self, raw_statement, value_cols):
+        """
+        由累计口径的报表推算单季度数据（与report_type=2的单季合并报表口径一致）
+        只保留公告日期在过去十个季度内的报告期
+        """
+        if raw_statement.empty:
+            return raw_statement.copy()
+
+        # 同一报告期有多条记录时优先保留update_flag=1的最新数据
+        quarterly = raw_statement
+        if 'update_flag' in quarterly.columns:
+            quarterly = quarterly.sort_values(by=['end_date', 'update_flag'], ascending=[True, False])
+        quarterly = quarterly.drop_duplicates(subset=['end_date']).reset_index(drop=True)
+
+        # 一季度的累计值就是单季值，其余季度减去同年上一季度的累计值
+        previous_suffix = {'0630': '0331', '0930': '0630', '1231': '0930'}
+        end_dates = quarterly['end_date'].astype(str)
+        previous_period = end_dates.str[:4] + end_dates.str[4:].map(previous_suffix)
+        is_first_quarter = end_dates.str[4:] == '0331'
+        for col in value_cols:
+            if col not in quarterly.columns:
+                continue
+            cumulative = pd.to_numeric(quarterly[col], errors='coerce')
+            previous_value = previous_period.map(dict(zip(end_dates, cumulative)))
+            quarterly[col] = cumulative.where(is_first_quarter, cumulative - previous_value)
+
+        if 'ann_date' in quarterly.columns:
+            quarterly = quarterly[quarterly['ann_date'] >= self.ten_quarters_ago_str]
+        return quarterly.reset_index(drop=True)
+
     def extract_income_data(self, stock_code):
         """提取利润表数据"""
         # 1. 获取过去五年的年度数据
-        all_income = self.pro.income(ts_code=stock_code,
-                                      start_date=self.five_years_ago_str,
-                                      end_date=self.current_date_str)
+        all_income = self._get_raw_statement('income', stock_code)
 
         # 获取最新一期数据（按end_date排序，取最新的一条）
         if not all_income.empty:
@@ -67,15 +136,9 @@ class DataExtractor:
         annual_net_profit['年度归母净利润'] = pd.to_numeric(annual_net_profit['年度归母净利润'], errors='coerce') / 100000000
         annual_net_profit['年度归母净利润'] = annual_net_profit['年度归母净利润'].round(1)
         
-        # 2. 获取过去十个季度的数据 (report_type=2)
-        quarterly_income = self.pro.income(ts_code=stock_code, 
-                                         start_date=self.ten_quarters_ago_str, 
-                                         end_date=self.current_date_str, 
-                                         report_type=2)
-        # 筛选最新更新的数据（update_flag=1表示最新数据）季度数据update_flag规则还不清楚
-        #if 'update_flag' in quarterly_income.columns:
-        #    quarterly_income = quarterly_income[quarterly_income['update_flag'] == '1']
-        
+        # 2. 由同一份报表推算过去十个季度的单季数据（每个报告期优先取update_flag=1的记录）
+        quarterly_income = self._single_quarter_view(all_income, ['total_revenue', 'n_income_attr_p'])
+
         #将数据升序排列
         quarterly_income = quarterly_income.sort_values(by='end_date', ascending=True).reset_index(drop=True)
 
@@ -100,9 +163,7 @@ class DataExtractor:
     def extract_cashflow_data(self, stock_code):
         """提取现金流量表数据"""
         # 3. 获取过去五年的年度现金流量数据
-        all_cashflow = self.pro.cashflow(ts_code=stock_code,
-                                          start_date=self.five_years_ago_str,
-                                          end_date=self.current_date_str)
+        all_cashflow = self._get_raw_statement('cashflow', stock_code)
 
         # 获取最新一期数据（按end_date排序，取最新的一条）
         if not all_cashflow.empty:
@@ -146,15 +207,9 @@ class DataExtractor:
             annual_cashflow_data['年度现金净增加额'] = pd.to_numeric(annual_cashflow_data['年度现金净增加额'], errors='coerce') / 100000000
             annual_cashflow_data['年度现金净增加额'] = annual_cashflow_data['年度现金净增加额'].round(1)
         
-        # 4. 获取过去十个季度的现金流量数据 (report_type=2)
-        quarterly_cashflow = self.pro.cashflow(ts_code=stock_code, 
-                                             start_date=self.ten_quarters_ago_str, 
-                                             end_date=self.current_date_str, 
-                                             report_type=2)
-        
-        # 筛选最新更新的数据（update_flag=1表示最新数据）季度数据update_flag规则还不清楚
-        #if 'update_flag' in quarterly_cashflow.columns:
-        #    quarterly_cashflow = quarterly_cashflow[quarterly_cashflow['update_flag'] == '1']
+        # 4. 由同一份报表推算过去十个季度的单季现金流量数据（每个报告期优先取update_flag=1的记录）
+        quarterly_cashflow = self._single_quarter_view(all_cashflow, ['n_cashflow_act'])
+
         #将数据升序排列
         quarterly_cashflow = quarterly_cashflow.sort_values(by='end_date', ascending=True).reset_index(drop=True)
 
@@ -198,12 +253,20 @@ class DataExtractor:
             'netprofit_yoy',         # 利润增长率
             'update_flag'            # 更新标志
         ]
-        all_indicators = self.pro.fina_indicator(
-            ts_code=stock_code,
-            start_date=self.five_years_ago_str,
-            end_date=self.current_date_str,
-            fields=','.join(annual_fields)
-        )
+        # 单季度指标字段，与年度指标一起请求，避免重复调用fina_indicator接口
+        quarterly_fields = [
+            'end_date', 
+            'q_netprofit_margin',   # 单季度销售净利率
+            'q_gsprofit_margin',    # 单季度销售毛利率
+            'q_gr_yoy',             # 营收同比增长率
+            'q_gr_qoq',             # 营收环比增长率
+            'q_netprofit_yoy',      # 利润同比增长率
+            'q_netprofit_qoq',      # 利润环比增长率
+            'update_flag'           # 更新标志
+        ]
+        raw_fields = ['ann_date'] + annual_fields + [col for col in quarterly_fields if col not in annual_fields]
+        raw_indicators = self._get_raw_statement('fina_indicator', stock_code, fields=','.join(raw_fields))
+        all_indicators = raw_indicators[[col for col in annual_fields if col in raw_indicators.columns]]
 
         # 获取最新一期数据（按end_date排序，取最新的一条）
         if not all_indicators.empty:
@@ -248,25 +311,12 @@ class DataExtractor:
             if col in annual_indicators_data.columns:
                 annual_indicators_data[col] = pd.to_numeric(annual_indicators_data[col], errors='coerce').round(1)  # 保留一位小数
 
-        # 6. 获取过去十个季度的财务指标
-        # 使用fields参数指定需要的字段，根据您提供的正确字段名
-        quarterly_fields = [
-            'end_date', 
-            'q_netprofit_margin',   # 单季度销售净利率
-            'q_gsprofit_margin',    # 单季度销售毛利率
-            'q_gr_yoy',             # 营收同比增长率
-            'q_gr_qoq',             # 营收环比增长率
-            'q_netprofit_yoy',      # 利润同比增长率
-            'q_netprofit_qoq',      # 利润环比增长率
-            'update_flag'           # 更新标志
-        ]
-        quarterly_indicators = self.pro.fina_indicator(
-            ts_code=stock_code, 
-            start_date=self.ten_quarters_ago_str, 
-            end_date=self.current_date_str,
-            fields=','.join(quarterly_fields)
-        )
-        
+        # 6. 从同一份数据中取出公告日期在过去十个季度内的单季度指标
+        quarterly_indicators = raw_indicators
+        if 'ann_date' in quarterly_indicators.columns:
+            quarterly_indicators = quarterly_indicators[quarterly_indicators['ann_date'] >= self.ten_quarters_ago_str]
+        quarterly_indicators = quarterly_indicators[[col for col in quarterly_fields if col in quarterly_indicators.columns]]
+
         # 筛选最新更新的数据（update_flag=1表示最新数据） 季度财报指标中update_flag规则还不清楚
         if 'update_flag' in quarterly_indicators.columns:
             quarterly_indicators = quarterly_indicators[quarterly_indicators['update_flag'] == '1']
@@ -331,15 +381,14 @@ class DataExtractor:
         #删去bz_cost、bz_code、curr_type这三列
         main_bz_data = main_bz_data.drop(columns=['bz_cost', 'bz_code', 'curr_type'], errors='ignore')
         
-        # 1）通过Tushare的income接口提取报告期和总收入的数据（total_revenue），假如命名为income_data
-        income_data = self.pro.income(ts_code=stock_code, 
-                                     start_date=self.five_years_ago_str, 
-                                     end_date=self.current_date_str,
-                                     fields='end_date,total_revenue')
+        # 1）从利润表缓冲区取报告期和总收入的数据（total_revenue），假如命名为income_data
+        raw_income = self._get_raw_statement('income', stock_code)
+        income_data = raw_income[[col for col in ['end_date', 'total_revenue', 'update_flag'] if col in raw_income.columns]]
         
         # 筛选最新更新的数据（update_flag=1表示最新数据）
         if 'update_flag' in income_data.columns:
             income_data = income_data[income_data['update_flag'] == '1']
+        income_data = income_data.copy()
         
         # Convert total_revenue to billions and round to 1 decimal place
         income_data['total_revenue'] = pd.to_numeric(income_data['total_revenue'], errors='coerce') / 100000000
@@ -416,7 +465,13 @@ class DataExtractor:
     def get_all_data(self, stock_code):
         """获取所有需要的数据"""
         print(f"开始提取股票 {stock_code} 的数据...")
-        
+
+        if self.max_workers > 1:
+            all_data = self._get_all_data_concurrent(stock_code)
+            print("\n数据提取完成！")
+            self.pro.cache.print_stats()
+            return all_data
+
         # 提取各类数据
         income_data = self.extract_income_data(stock_code)
         cashflow_data = self.extract_cashflow_data(stock_code)
@@ -449,6 +504,37 @@ class DataExtractor:
         all_data['management_info'] = management_info
         
         print("\n数据提取完成！")
+        self.pro.cache.print_stats()
+        return all_data
+
+    def _get_all_data_concurrent(self, stock_code):
+        """
+        并发提取所有数据，结果与顺序提取完全相同
+        只有主营业务构成依赖利润表的年度营业收入，其余接口互不依赖
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            income_future = executor.submit(self.extract_income_data, stock_code)
+            cashflow_future = executor.submit(self.extract_cashflow_data, stock_code)
+            fina_future = executor.submit(self.extract_financial_indicators, stock_code)
+            company_future = executor.submit(self.extract_company_information, stock_code)
+            top10_holders_future = executor.submit(self.extract_top10_shareholders, stock_code)
+            daily_future = executor.submit(self.extract_daily_market_data, stock_code)
+            management_future = executor.submit(self.extract_management_information, stock_code)
+
+            # 利润表完成后再提交主营业务构成
+            income_data = income_future.result()
+            main_bz_future = executor.submit(self.extract_main_business_composition, stock_code, income_data['annual_revenue'])
+
+            # 按顺序提取时的键顺序组装结果
+            all_data = {}
+            all_data.update(income_data)
+            all_data.update(cashflow_future.result())
+            all_data.update(fina_future.result())
+            all_data['main_business_composition'] = main_bz_future.result()
+            all_data['company_info'] = company_future.result()
+            all_data['top10_holders'] = top10_holders_future.result()
+            all_data['daily_market_data'] = daily_future.result()
+            all_data['management_info'] = management_future.result()
         return all_data
 
     def extract_company_information(self, stock_code):
@@ -500,40 +586,33 @@ class DataExtractor:
 
     def extract_daily_market_data(self, stock_code):
         """提取当日市场数据"""
-        from datetime import datetime, timedelta
-        
-        # 从当前日期开始尝试提取数据
-        current_date = datetime.strptime(self.current_date_str, '%Y%m%d')
-        
-        # 尝试最多向前查找30天的数据
-        for i in range(31):  # 包含当天，所以是31天
-            current_trade_date = current_date - timedelta(days=i)
-            current_trade_date_str = current_trade_date.strftime('%Y%m%d')
+        # 通过交易日历确定最近的交易日，一次请求覆盖最近约30天（停牌股票可能没有当天数据）
+        sessions = get_trade_calendar().previous_sessions(MARKET_DATA_LOOKBACK_SESSIONS, self.current_date)
+
+        # 使用daily_basic接口获取这段时间的市场数据
+        daily_data = self.pro.daily_basic(ts_code=stock_code, start_date=sessions[0], end_date=sessions[-1])
+
+        if not daily_data.empty:
+            # 取最近一个交易日的记录
+            daily_row = daily_data.sort_values(by='trade_date', ascending=False).iloc[0]
+            current_trade_date_str = str(daily_row['trade_date'])
+            print(f"成功提取股票 {stock_code} 在 {current_trade_date_str} 的市场数据")
+
+            # 提取所需字段并以合适的变量名保存
+            market_data = {
+                'pe_ttm': pd.to_numeric(daily_row.get('pe_ttm', None), errors='coerce'),  # 市盈率(TTM)
+                'pb': pd.to_numeric(daily_row.get('pb', None), errors='coerce'),  # 市净率
+                'total_mv': pd.to_numeric(daily_row.get('total_mv', None), errors='coerce'),  # 总市值(元)
+                'trade_date': current_trade_date_str  # 添加实际提取数据的日期
+            }
             
-            # 使用daily_basic接口获取指定日期的市场数据
-            daily_data = self.pro.daily_basic(ts_code=stock_code, trade_date=current_trade_date_str)
+            # 将总市值转换为亿元单位，并保留一位小数
+            if market_data['total_mv'] is not None:
+                market_data['total_mv'] = round(market_data['total_mv'] / 10000, 1)  # 万元转亿元
             
-            if not daily_data.empty:
-                print(f"成功提取股票 {stock_code} 在 {current_trade_date_str} 的市场数据")
-                
-                # 取第一条记录
-                daily_row = daily_data.iloc[0]
-                
-                # 提取所需字段并以合适的变量名保存
-                market_data = {
-                    'pe_ttm': pd.to_numeric(daily_row.get('pe_ttm', None), errors='coerce'),  # 市盈率(TTM)
-                    'pb': pd.to_numeric(daily_row.get('pb', None), errors='coerce'),  # 市净率
-                    'total_mv': pd.to_numeric(daily_row.get('total_mv', None), errors='coerce'),  # 总市值(元)
-                    'trade_date': current_trade_date_str  # 添加实际提取数据的日期
-                }
-                
-                # 将总市值转换为亿元单位，并保留一位小数
-                if market_data['total_mv'] is not None:
-                    market_data['total_mv'] = round(market_data['total_mv'] / 10000, 1)  # 万元转亿元
-                
-                print(f"数据提取自日期: {current_trade_date_str}")
-                return market_data
-        
+            print(f"数据提取自日期: {current_trade_date_str}")
+            return market_data
+
         # 如果30天内都没有数据，返回空值
         print(f"警告: 在过去30天内未找到股票 {stock_code} 的市场数据")
         return {
@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 from openai import OpenAI
 import os
 from Jiuyan_spider import JiuYanGongSheSpider, get_valid_cookie
+from llm_metrics import get_default_llm_metrics
 from datetime import datetime
 
 
@@ -320,15 +321,20 @@ def get_stock_abnormal_info(stock_code, stock_name, date):
         api_key=api_key
     )
 
-    # 创建一个对话请求，包含从韭研公社获取的内容作为上下文
-    response = client.responses.create(
-        model="doubao-seed-1-6-251015",
-        input=[
-            {"role": "system", "content": "你是一名专业投资人，擅长分析股票市场信息"},
-            {"role": "user", "content": f"以下是我在网络上搜集到的关于{stock_name}的最新资讯：\n\n{jiuyan_content}\n\n基于以上信息，提炼{stock_code}{stock_name}{date}股价异动的主要原因。注意关注发帖时间，判断帖子的时效性"},
-        ],
-        temperature=0.4
-    )
+    # 创建一个对话请求，包含从韭研公社获取的内容作为上下文，同时记录token用量和耗时
+    model = "doubao-seed-1-6-251015"
+    with get_default_llm_metrics().track('doubao', model, 'abnormal_info', stock_name) as call:
+        response = client.responses.create(
+            model=model,
+            input=[
+                {"role": "system", "content": "你是一名专业投资人，擅长分析股票市场信息"},
+                {"role": "user", "content": f"以下是我在网络上搜集到的关于{stock_name}的最新资讯：\n\n{jiuyan_content}\n\n基于以上信息，提炼{stock_code}{stock_name}{date}股价异动的主要原因。注意关注发帖时间，判断帖子的时效性"},
+            ],
+            temperature=0.4
+        )
+        call.mark_first_token()
+        if response.usage:
+            call.set_usage(response.usage.input_tokens, response.usage.output_tokens)
 
     # 从response中提取text内容
     if response.output and len(response.output) > 0:
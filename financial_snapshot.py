@@ -0,0 +1,140 @@
+import os
+import datetime
+import threading
+import pandas as pd
+from tushare_cache import CACHE_ROOT, next_report_refresh
+
+
+# 全市场按报告期批量拉取的数据集：数据集名 -> VIP接口名
+# 单季数据由DataExtractor从累计口径推算，不再单独拉取report_type=2
+SNAPSHOT_DATASETS = {
+    'income': 'income_vip',
+    'cashflow': 'cashflow_vip',
+    'fina_indicator': 'fina_indicator_vip',
+}
+
+# fina_indicator_vip需要显式指定字段，覆盖年度和单季度指标
+FINA_INDICATOR_FIELDS = [
+    'ts_code', 'ann_date', 'end_date',
+    'netprofit_margin', 'grossprofit_margin', 'roe_waa', 'roa', 'roic', 'tr_yoy', 'netprofit_yoy',
+    'q_netprofit_margin', 'q_gsprofit_margin', 'q_gr_yoy', 'q_gr_qoq', 'q_netprofit_yoy', 'q_netprofit_qoq',
+    'update_flag'
+]
+
+# 单次请求的最大行数，超过时按offset分页
+PAGE_SIZE = 5000
+
+# 报告期结束超过该天数后视为不再更新，本地文件永久有效
+STABLE_PERIOD_DAYS = 480
+
+
+def report_periods(start_date, end_date):
+    """返回start_date到end_date之间的所有报告期（季度末日期），格式YYYYMMDD"""
+    periods = []
+    for year in range(start_date.year, end_date.year + 1):
+        for month_day in ('0331', '0630', '0930', '1231'):
+            period = f"{year}{month_day}"
+            if start_date.strftime('%Y%m%d') <= period <= end_date.strftime('%Y%m%d'):
+                periods.append(period)
+    return periods
+
+
+class FinancialSnapshot:
+    def __init__(self, pro, snapshot_dir=None):
+        """
+        全市场财务数据快照
+        每个报告期只调用一次VIP接口拉取全部股票，按列式parquet文件保存在本地，
+        单只股票的数据直接从内存中切片得到
+        """
+        self.pro = pro
+        self.snapshot_dir = snapshot_dir or os.path.join(CACHE_ROOT, 'snapshot')
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, dataset, period):
+        return os.path.join(self.snapshot_dir, dataset, f"{period}.parquet")
+
+    def _is_fresh(self, path, period):
+        """判断本地文件是否仍然有效"""
+        if not os.path.exists(path):
+            return False
+        period_end = datetime.datetime.strptime(period, '%Y%m%d')
+        if (datetime.datetime.now() - period_end).days > STABLE_PERIOD_DAYS:
+            return True
+        written_at = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+        return next_report_refresh(written_at) > datetime.datetime.now()
+
+    def _fetch_period(self, dataset, period):
+        """分页拉取某个报告期的全市场数据"""
+        api_name = SNAPSHOT_DATASETS[dataset]
+        fields = ','.join(FINA_INDICATOR_FIELDS) if dataset == 'fina_indicator' else ''
+        pages = []
+        offset = 0
+        while True:
+            page = self.pro.query(api_name, fields=fields, period=period,
+                                  limit=PAGE_SIZE, offset=offset)
+            pages.append(page)
+            if len(page) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+        return pd.concat(pages, ignore_index=True)
+
+    def load(self, periods):
+        """加载指定报告期的快照，本地缺失或过期的报告期才会请求接口"""
+        fetched = 0
+        for dataset in SNAPSHOT_DATASETS:
+            frames = []
+            for period in periods:
+                path = self._path(dataset, period)
+                if self._is_fresh(path, period):
+                    frames.append(pd.read_parquet(path))
+                    continue
+                data = self._fetch_period(dataset, period)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                data.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+                frames.append(data)
+                fetched += 1
+            frames = [frame for frame in frames if not frame.empty]
+            combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['ts_code', 'ann_date', 'end_date'])
+            # 按ts_code排序建立索引，单只股票切片时只需二分查找
+            combined = combined.sort_values(by=['ts_code', 'end_date'], ascending=[True, False])
+            with self._lock:
+                self._frames[dataset] = combined.set_index('ts_code', drop=False)
+        print(f"财务快照加载完成，共{len(periods)}个报告期，本次请求接口{fetched}次")
+
+    def slice(self, dataset, stock_code, start_date=None, end_date=None, fields=None):
+        """
+        取出单只股票的数据，公告日期在[start_date, end_date]之间，
+        返回结果与按ts_code调用对应接口的结构一致
+        """
+        frame = self._frames[dataset]
+        data = frame.loc[stock_code:stock_code].reset_index(drop=True)
+        if start_date and 'ann_date' in data.columns:
+            data = data[data['ann_date'] >= start_date]
+        if end_date and 'ann_date' in data.columns:
+            data = data[data['ann_date'] <= end_date]
+        # update_flag为1的记录排在前面，去重时优先保留最新数据
+        sort_cols = ['end_date', 'update_flag'] if 'update_flag' in data.columns else ['end_date']
+        data = data.sort_values(by=sort_cols, ascending=False).reset_index(drop=True)
+        if fields:
+            columns = [col for col in fields.split(',') if col in data.columns]
+            data = data[columns]
+        return data
+
+
+_default_snapshot = None
+_default_snapshot_lock = threading.Lock()
+
+
+def get_default_snapshot(pro, periods):
+    """获取进程内共享的快照，第一次调用时加载，批量生成报告时只加载一次"""
+    global _default_snapshot
+    with _default_snapshot_lock:
+        if _default_snapshot is None:
+            snapshot = FinancialSnapshot(pro)
+            snapshot.load(periods)
+            _default_snapshot = snapshot
+        return _default_snapshot
@@ -5,6 +5,7 @@ import json
 
 from openai import OpenAI
 from openai.types.chat.chat_completion import Choice
+from llm_metrics import get_default_llm_metrics
 
 client = OpenAI(
     base_url="https://api.moonshot.cn/v1",
@@ -26,21 +27,27 @@ def search_impl(arguments: Dict[str, Any]) -> Any:
     return arguments
 
 
-def chat(messages) -> Choice:
-    completion = client.chat.completions.create(
-        model="kimi-k2-thinking",
-        messages=messages,
-        temperature=0.6,
-        max_tokens=32768,
-        tools=[
-            {
-                "type": "builtin_function",  # <-- 使用 builtin_function 声明 $web_search 函数，请在每次请求都完整地带上 tools 声明
-                "function": {
-                    "name": "$web_search",
-                },
-            }
-        ]
-    )
+def chat(messages, stock_name=None) -> Choice:
+    # 工具调用循环中的每一轮请求都单独记录token用量和耗时
+    model = "kimi-k2-thinking"
+    with get_default_llm_metrics().track('kimi', model, 'abnormal_info', stock_name) as call:
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.6,
+            max_tokens=32768,
+            tools=[
+                {
+                    "type": "builtin_function",  # <-- 使用 builtin_function 声明 $web_search 函数，请在每次请求都完整地带上 tools 声明
+                    "function": {
+                        "name": "$web_search",
+                    },
+                }
+            ]
+        )
+        call.mark_first_token()
+        if completion.usage:
+            call.set_usage(completion.usage.prompt_tokens, completion.usage.completion_tokens)
     return completion.choices[0]
 
 
@@ -64,7 +71,7 @@ def main(date, ts_code, stock_name):
 
     finish_reason = None
     while finish_reason is None or finish_reason == "tool_calls":
-        choice = chat(messages)
+        choice = chat(messages, stock_name)
         finish_reason = choice.finish_reason
         if finish_reason == "tool_calls":  # <-- 判断当前返回内容是否包含 tool_calls
             messages.append(choice.message)  # <-- 我们将 Kimi 大模型返回给我们的 assistant 消息也添加到上下文中，以便于下次请求时 Kimi 大模型能理解我们的诉求
@@ -87,6 +94,7 @@ def main(date, ts_code, stock_name):
                 })
  
     print(choice.message.content)  # <-- 在这里，我们才将模型生成的回复返回给用户
+    get_default_llm_metrics().print_summary()
 
 
 if __name__ == '__main__':
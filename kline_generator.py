@@ -1,59 +1,74 @@
-import tushare as ts
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 import os
-from datetime import datetime, timedelta
+import time
+import threading
 import matplotlib
 import base64
 from io import BytesIO
+from tushare_client import get_pro_api
+from trade_calendar import get_trade_calendar
+from price_store import get_default_price_store
 matplotlib.use('Agg')  # Use non-interactive backend
 # 设置字体，解决中文乱码问题
 plt.rcParams["font.family"] = ["Heiti TC"]
 # 解决负号显示问题（可选）
 plt.rcParams['axes.unicode_minus'] = False  # 正确显示负号
 
+# 每月的交易日数（近似值）
+TRADE_DAYS_PER_MONTH = 20
+
+# K线实体和成交额柱子的宽度
+CANDLE_WIDTH = 0.8
+
+# 图片编码设置，可以通过环境变量修改
+# 格式：png、svg、webp、jpeg；webp和jpeg通过Pillow编码
+KLINE_IMAGE_FORMAT = os.environ.get('KLINE_IMAGE_FORMAT', 'png').lower()
+# 目标分辨率
+KLINE_IMAGE_DPI = int(os.environ.get('KLINE_IMAGE_DPI', 300))
+# 单张图片的字节上限，超出时逐级降低分辨率，0表示不限制（svg与分辨率无关，不受限制）
+KLINE_IMAGE_MAX_BYTES = int(os.environ.get('KLINE_IMAGE_MAX_BYTES', 0))
+# webp和jpeg的压缩质量
+KLINE_IMAGE_QUALITY = int(os.environ.get('KLINE_IMAGE_QUALITY', 85))
+
+# 超出字节上限时依次尝试的分辨率
+FALLBACK_DPIS = (200, 150, 120, 100, 72)
+
+IMAGE_MIME_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
 class KLineGenerator:
     def __init__(self):
-        # Get token from environment variable
-        token = os.environ.get('TUSHARE_TOKEN')
-        if not token:
-            raise ValueError("TUSHARE_TOKEN环境变量未设置")
-        
-        ts.set_token(token)
-        self.pro = ts.pro_api()
+        # 使用进程内共享的Tushare客户端和本地行情库
+        self.pro = get_pro_api()
+        self.price_store = get_default_price_store()
 
     def get_stock_data(self, stock_code, months=6):
         """
         获取股票的行情数据
         """
-        # 计算开始日期
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=months*30)  # 近似6个月
-        
-        start_date_str = start_date.strftime('%Y%m%d')
-        end_date_str = end_date.strftime('%Y%m%d')
-        
-        # 获取日线数据
-        df = self.pro.daily(
-            ts_code=stock_code,
-            start_date=start_date_str,
-            end_date=end_date_str,
-            fields='trade_date,open,high,low,close,vol,amount'
-        )
-        
-        # 按日期排序（升序）- 最早日期在前，最新日期在后。reset_index确保时序正常
-        df = df.sort_values(by='trade_date').reset_index(drop=True)
-        # 因子提取复权，准备处理前复权
-        adj_df = self.pro.adj_factor(ts_code=stock_code,start_date=start_date_str,end_date=end_date_str)
-        # 复权因子按时间升序排序
-        adj_df = adj_df.sort_values(by="trade_date").reset_index(drop=True)
+        # 通过交易日历计算起止日期，每月约20个交易日
+        sessions = get_trade_calendar().previous_sessions(months * TRADE_DAYS_PER_MONTH)
+
+        # 从本地行情库读取，缺失的交易日由行情库按全市场补齐
+        df = self.price_store.stock_history(stock_code, sessions)
+        df = df[['trade_date', 'open', 'high', 'low', 'close', 'vol', 'amount', 'adj_factor']].copy()
+        if df.empty:
+            return df
         # 获取最新一天的复权因子（最后一行）
-        latest_adj = adj_df.iloc[-1]["adj_factor"]  
+        latest_adj = df.iloc[-1]["adj_factor"]
         # 将后复权因子转化为前复权因子（让最新一天的因子为1）
-        adj_df["norm_adj_factor"] = adj_df["adj_factor"] / latest_adj
-        df = df.merge(adj_df[["trade_date","norm_adj_factor"]],on="trade_date",how="left")
+        df["norm_adj_factor"] = df["adj_factor"] / latest_adj
+        df = df.drop(columns=["adj_factor"])
         # 进行前复权计算
         df["open"] = df["open"] * df["norm_adj_factor"]
         df["high"] = df["high"] * df["norm_adj_factor"]
@@ -63,9 +78,10 @@ class KLineGenerator:
         df['trade_date'] = pd.to_datetime(df['trade_date'])
         return df
 
-    def plot_kline(self, stock_code, company_name):
+    def plot_kline(self, stock_code, company_name, chart_cache=None):
         """
         绘制K线图，返回base64编码的图片，不保存文件
+        chart_cache: 图表缓存，同一股票、同一交易日、同一绘图选项的图片直接从缓存读取
         """
         # 获取数据
         data = self.get_stock_data(stock_code)
@@ -74,80 +90,224 @@ class KLineGenerator:
             print(f"未能获取到 {stock_code} 的数据")
             return None
 
-        # 创建图像，分为上下两个子图
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10), 
-                                       gridspec_kw={'height_ratios': [3, 1]})
-        
-        # 设置标题
-        fig.suptitle(f'{company_name}({stock_code}) K线图 (最近6个月)', fontsize=16)
-        
+        if chart_cache is None:
+            return render_kline(data, stock_code, company_name)
+        key = chart_cache_key(chart_cache, stock_code, company_name, data)
+        image = chart_cache.get(key)
+        if image is None:
+            image = render_kline(data, stock_code, company_name)
+            chart_cache.set(key, image)
+        return image
+
+
+def _bar_vertices(x, bottoms, tops, width=CANDLE_WIDTH):
+    """生成一组柱子的矩形顶点，形状为(n, 4, 2)"""
+    left = x - width / 2
+    right = x + width / 2
+    return np.stack([
+        np.column_stack([left, bottoms]),
+        np.column_stack([left, tops]),
+        np.column_stack([right, tops]),
+        np.column_stack([right, bottoms]),
+    ], axis=1)
+
+
+class KLineFigureTemplate:
+    def __init__(self):
+        """
+        可复用的K线图模板
+        图像、子图、标题、网格、图例和各组artist只创建一次，
+        每只股票只更新artist的数据、刻度标签和标题
+        """
+        self.fig = Figure(figsize=(14, 10))
+        FigureCanvasAgg(self.fig)
+        self.ax1, self.ax2 = self.fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]})
+        self.title = self.fig.suptitle('', fontsize=16)
+
+        # 上图：蜡烛图和均线
+        # 收盘价大于等于开盘价为涨（红色），否则为跌（绿色）；涨跌各用一组集合批量绘制
+        self.wicks = {}
+        self.bodies = {}
+        self.amount_bars = {}
+        for direction, color in (('up', 'red'), ('down', 'green')):
+            # 最高价到最低价的线（影线）
+            self.wicks[direction] = self.ax1.add_collection(
+                LineCollection([], colors=color, linewidths=0.5))
+            # 开盘价到收盘价的实体（蜡烛）
+            self.bodies[direction] = self.ax1.add_collection(
+                PolyCollection([], facecolors=color, edgecolors=color, linewidths=0.3, alpha=0.8))
+            # 成交额柱子，与bar一致从0开始，不在0以下留白
+            bars = PolyCollection([], facecolors=color, edgecolors='none', alpha=0.7)
+            bars.sticky_edges.y.append(0)
+            self.amount_bars[direction] = self.ax2.add_collection(bars)
+
+        self.ax1.set_ylabel('价格', fontsize=12)
+        self.ax1.grid(True, linestyle='--', alpha=0.6, axis='y')
+        self.ax1.set_title('K线图', fontsize=14)
+        # 添加价格均线
+        self.ma5_line, = self.ax1.plot([], [], label='5日均线', color='orange', linewidth=1)
+        self.ma20_line, = self.ax1.plot([], [], label='20日均线', color='purple', linewidth=1)
+        self.ax1.legend(loc='best')
+
+        # 下图：成交额
+        self.ax2.set_ylabel('成交额(亿元)', fontsize=12)
+        self.ax2.grid(True, linestyle='--', alpha=0.6, axis='y')
+        self.ax2.set_title('成交额图', fontsize=14)
+
+    @staticmethod
+    def _rescale(ax, x_min, x_max, y_min, y_max):
+        """按新的数据范围重新计算坐标轴（集合不参与relim，需要手动更新数据范围）"""
+        ax.ignore_existing_data_limits = True
+        ax.update_datalim([(x_min, y_min), (x_max, y_max)])
+        ax.autoscale_view()
+
+    def update(self, data, stock_code, company_name):
+        """用一只股票的行情数据更新模板，返回更新后的Figure"""
+        self.title.set_text(f'{company_name}({stock_code}) K线图 (最近6个月)')
+
         # 使用索引作为x轴，确保交易日连续 ( oldest date on left, newest on right)
-        x = range(len(data))  # 索引位置列表
+        x = np.arange(len(data))  # 索引位置列表
         opens = data['open'].values
         highs = data['high'].values
         lows = data['low'].values
         closes = data['close'].values
-        
-        # 蜡烛图部分
-        # 绘制蜡烛图 - 根据涨跌设置颜色
-        for i in range(len(data)):
-            open_price = opens[i]
-            high_price = highs[i]
-            low_price = lows[i]
-            close_price = closes[i]
-            
-            # 判断涨跌 - 收盘价大于开盘价为涨（红色），否则为跌（绿色）
-            color = 'red' if close_price >= open_price else 'green'
-            
-            # 绘制最高价到最低价的线（影线）
-            ax1.plot([x[i], x[i]], [low_price, high_price], color=color, linewidth=0.5)
-            
-            # 绘制开盘价到收盘价的实体（蜡烛）
-            bottom = min(open_price, close_price)
-            top = max(open_price, close_price)
-            ax1.bar(x[i], top - bottom, width=0.8, bottom=bottom, 
-                   color=color, alpha=0.8, edgecolor=color, linewidth=0.3)
-        
-        # 设置上图的属性
-        ax1.set_ylabel('价格', fontsize=12)
-        ax1.grid(True, linestyle='--', alpha=0.6, axis='y')
-        ax1.set_title('K线图', fontsize=14)
-        
-        # 添加价格均线
-        # 使用x轴索引绘制均线
-        ax1.plot(x, data['close'].rolling(window=5).mean(), label='5日均线', color='orange', linewidth=1)
-        ax1.plot(x, data['close'].rolling(window=20).mean(), label='20日均线', color='purple', linewidth=1)
-        ax1.legend(loc='best')
-        
-        # 成交额图部分
         amount = data['amount'].values/100000  # 成交额（亿元）原单位为千元
-        colors = ['red' if closes[i] >= opens[i] else 'green' for i in range(len(data))]
-        
-        ax2.bar(x, amount, color=colors, alpha=0.7, width=0.8)
-        ax2.set_ylabel('成交额(亿元)', fontsize=12)
-        ax2.grid(True, linestyle='--', alpha=0.6, axis='y')
-        ax2.set_title('成交额图', fontsize=14)
-        
+        is_up = closes >= opens
+
+        for direction, mask in (('up', is_up), ('down', ~is_up)):
+            self.wicks[direction].set_segments(
+                np.stack([np.column_stack([x[mask], lows[mask]]),
+                          np.column_stack([x[mask], highs[mask]])], axis=1))
+            self.bodies[direction].set_verts(
+                _bar_vertices(x[mask], np.minimum(opens[mask], closes[mask]), np.maximum(opens[mask], closes[mask])))
+            self.amount_bars[direction].set_verts(
+                _bar_vertices(x[mask], np.zeros(mask.sum()), amount[mask]))
+
+        self.ma5_line.set_data(x, data['close'].rolling(window=5).mean())
+        self.ma20_line.set_data(x, data['close'].rolling(window=20).mean())
+
+        half_width = CANDLE_WIDTH / 2
+        self._rescale(self.ax1, -half_width, len(data) - 1 + half_width, np.nanmin(lows), np.nanmax(highs))
+        self._rescale(self.ax2, -half_width, len(data) - 1 + half_width, 0, np.nanmax(amount))
+
         # 设置X轴标签，使用实际日期 - 每隔10个交易日显示一个日期
         date_labels = data['trade_date'].dt.strftime('%m-%d')
         step = max(1, len(date_labels) // 10)  # 确保最多显示10个日期标签
-        visible_dates = [date_labels[i] if i % step == 0 else '' for i in range(len(date_labels))]
-        # Set the same x-axis for both subplots
-        ax1.set_xticks(x)  # Ensure both subplots have the same x-axis ticks
-        ax1.set_xticklabels(visible_dates, rotation=45, ha='right')
-        ax2.set_xticks(x)  # 刻度位置与索引对应
-        ax2.set_xticklabels(visible_dates, rotation=45, ha='right')  # 仅显示部分日期以避免拥挤
-  
-        # 调整布局
-        plt.tight_layout()
-        
-        # 将图像保存到字节流中并转换为base64
+        # 只在显示日期的位置创建刻度，每个刻度都是独立的artist，逐日创建会拖慢绘图
+        tick_positions = list(range(0, len(date_labels), step))
+        visible_dates = [date_labels[i] for i in tick_positions]
+        for ax in (self.ax1, self.ax2):
+            ax.set_xticks(tick_positions)
+            ax.set_xticklabels(visible_dates, rotation=45, ha='right')  # 仅显示部分日期以避免拥挤
+
+        # 刻度标签宽度随股票变化，重新调整布局
+        self.fig.tight_layout()
+        return self.fig
+
+
+_template = None
+_template_lock = threading.Lock()
+# 模板的artist会被原地修改，同一时刻只能渲染一张图
+_render_lock = threading.Lock()
+
+
+def get_kline_template():
+    """获取进程内共享的K线图模板，第一次调用时创建"""
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = KLineFigureTemplate()
+        return _template
+
+
+def encode_figure(fig, image_format=KLINE_IMAGE_FORMAT, dpi=KLINE_IMAGE_DPI, max_bytes=KLINE_IMAGE_MAX_BYTES):
+    """
+    按指定格式编码图片，返回(图片字节, 实际使用的分辨率)
+    设置了字节上限时从目标分辨率开始逐级降低，返回第一个满足上限的结果
+    """
+    image_format = 'jpeg' if image_format == 'jpg' else image_format
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ValueError(f"不支持的图片格式: {image_format}")
+
+    save_kwargs = {'format': image_format, 'bbox_inches': 'tight'}
+    if image_format in ('webp', 'jpeg'):
+        save_kwargs['pil_kwargs'] = {'quality': KLINE_IMAGE_QUALITY}
+    if image_format == 'svg' or not max_bytes:
+        candidates = [dpi]
+    else:
+        candidates = [dpi] + [d for d in FALLBACK_DPIS if d < dpi]
+
+    while True:
+        candidate = candidates.pop(0)
         buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()  # 关闭图形以释放内存
-        return f"data:image/png;base64,{image_base64}"
+        fig.savefig(buffer, dpi=candidate, **save_kwargs)
+        image_bytes = buffer.getvalue()
+        if not max_bytes or len(image_bytes) <= max_bytes:
+            return image_bytes, candidate
+        if not candidates:
+            print(f"K线图在最低分辨率{candidate}dpi下仍有{len(image_bytes) / 1024:.0f}KB，超出上限{max_bytes / 1024:.0f}KB")
+            return image_bytes, candidate
+        # 图片大小大致与分辨率的平方成正比，跳过预计仍会超出上限的分辨率，减少重复编码
+        expected = [d for d in candidates if len(image_bytes) * (d / candidate) ** 2 <= max_bytes]
+        candidates = candidates[candidates.index(expected[0]):] if expected else candidates[-1:]
+
+
+def kline_image_options():
+    """当前的图片编码设置，作为图表缓存键的一部分"""
+    return {
+        'format': KLINE_IMAGE_FORMAT,
+        'dpi': KLINE_IMAGE_DPI,
+        'max_bytes': KLINE_IMAGE_MAX_BYTES,
+        'quality': KLINE_IMAGE_QUALITY,
+    }
+
+
+def chart_cache_key(chart_cache, stock_code, company_name, data):
+    """由股票代码、行情最后一个交易日和绘图选项（含标题中的公司名称）生成图表缓存键"""
+    last_trade_date = data['trade_date'].iloc[-1].strftime('%Y%m%d')
+    options = dict(kline_image_options(), company_name=company_name, sessions=len(data))
+    return chart_cache.make_key(stock_code, last_trade_date, options)
+
+
+def render_kline(data, stock_code, company_name, image_format=KLINE_IMAGE_FORMAT,
+                 dpi=KLINE_IMAGE_DPI, max_bytes=KLINE_IMAGE_MAX_BYTES):
+    """
+    根据行情数据绘制K线图，返回base64编码的图片（data URI）
+    只依赖传入的数据，可以在渲染进程中单独调用；同一进程内复用同一个图像模板
+    """
+    with _render_lock:
+        fig = get_kline_template().update(data, stock_code, company_name)
+
+        # 将图像编码后转换为base64，并报告编码耗时和大小
+        start_time = time.perf_counter()
+        image_bytes, used_dpi = encode_figure(fig, image_format, dpi, max_bytes)
+        encode_seconds = time.perf_counter() - start_time
+    image_format = 'jpeg' if image_format == 'jpg' else image_format
+    print(f"K线图编码完成: {stock_code} {image_format} {used_dpi}dpi, "
+          f"{len(image_bytes) / 1024:.0f}KB, 耗时 {encode_seconds:.2f} 秒")
+    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+    return f"data:{IMAGE_MIME_TYPES[image_format]};base64,{image_base64}"
+
+
+def kline_chart_data(data, digits=2):
+    """
+    把行情数据整理成浏览器端绘图用的紧凑数组（价格、成交额、5日和20日均线）
+    缺失值转换为None，序列化后为null
+    """
+    def values(series):
+        return [None if pd.isna(v) else round(float(v), digits) for v in series]
+
+    closes = data['close']
+    return {
+        'dates': data['trade_date'].dt.strftime('%Y-%m-%d').tolist(),
+        'open': values(data['open']),
+        'high': values(data['high']),
+        'low': values(data['low']),
+        'close': values(closes),
+        'amount': values(data['amount'] / 100000),  # 成交额（亿元）原单位为千元
+        'ma5': values(closes.rolling(window=5).mean()),
+        'ma20': values(closes.rolling(window=20).mean()),
+    }
 
 
 def main():
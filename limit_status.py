@@ -0,0 +1,95 @@
+import numpy as np
+
+
+# 涨跌停状态编码，状态矩阵中每个(股票, 交易日)只占一个int8
+NOT_TRADED = -1
+NO_LIMIT = 0
+UP_LIMIT = 1
+DOWN_LIMIT = 2
+BROKEN_UP = 3      # 炸板：盘中涨停，收盘未封住且收涨
+BIG_LOSS = 4       # 大面：盘中涨停，收盘未封住且收跌
+BROKEN_DOWN = 5    # 翘板：盘中跌停，收盘翘起且收跌
+REBOUND = 6        # 反攻：盘中跌停，收盘翘起且收涨
+
+STATUS_LABELS = {
+    NO_LIMIT: '未涨跌停',
+    UP_LIMIT: '涨停',
+    DOWN_LIMIT: '跌停',
+    BROKEN_UP: '炸板',
+    BIG_LOSS: '大面',
+    BROKEN_DOWN: '翘板',
+    REBOUND: '反攻',
+}
+
+
+def classify_limit_status(df):
+    """
+    按行情和涨跌停价批量判断当天的涨跌停状态
+    df需要包含close, high, low, change, up_limit, down_limit列，返回int8状态编码数组
+    """
+    close = df['close'].to_numpy(dtype=float)
+    high = df['high'].to_numpy(dtype=float)
+    low = df['low'].to_numpy(dtype=float)
+    change = df['change'].to_numpy(dtype=float)
+    up_limit = df['up_limit'].to_numpy(dtype=float)
+    down_limit = df['down_limit'].to_numpy(dtype=float)
+
+    # 缺少涨跌停价或收盘价的股票记为未涨跌停；其余NaN参与比较时结果为False
+    has_limit = ~(np.isnan(up_limit) | np.isnan(down_limit) | np.isnan(close))
+    touched_up = high >= up_limit
+    touched_down = low <= down_limit
+    conditions = [
+        ~has_limit,
+        close >= up_limit,
+        close <= down_limit,
+        touched_up & (change >= 0),
+        touched_up,
+        touched_down & (change <= 0),
+        touched_down,
+    ]
+    choices = [NO_LIMIT, UP_LIMIT, DOWN_LIMIT, BROKEN_UP, BIG_LOSS, BROKEN_DOWN, REBOUND]
+    return np.select(conditions, choices, default=NO_LIMIT).astype(np.int8)
+
+
+def run_lengths(mask):
+    """
+    对二维布尔矩阵按行计算游程长度
+    返回同形状的矩阵，每个位置为以该交易日结尾的连续True天数
+    """
+    mask = np.asarray(mask, dtype=bool)
+    index = np.arange(mask.shape[1])
+    last_break = np.maximum.accumulate(np.where(mask, -1, index), axis=1)
+    return np.where(mask, index - last_break, 0)
+
+
+def consecutive_status(matrix):
+    """
+    根据状态矩阵（行为股票，列为按时间升序的交易日）计算最后一个交易日的连板状态
+    返回字符串数组，最后一天未交易的股票为None
+    """
+    matrix = np.asarray(matrix, dtype=np.int8)
+    n_days = matrix.shape[1]
+    last = matrix[:, -1]
+
+    is_up = matrix == UP_LIMIT
+    up_streak = run_lengths(is_up)[:, -1]
+    up_num = is_up.sum(axis=1)
+    # 第一次涨停到最后一天的交易日数（含首尾）
+    up_days = n_days - is_up.argmax(axis=1)
+    down_streak = run_lengths(matrix == DOWN_LIMIT)[:, -1]
+
+    result = np.full(len(matrix), None, dtype=object)
+    for code, label in STATUS_LABELS.items():
+        result[last == code] = label
+
+    up_rows = np.flatnonzero(last == UP_LIMIT)
+    for i in up_rows:
+        if up_num[i] == 1:
+            result[i] = '首板'
+        elif up_streak[i] == up_num[i]:
+            result[i] = f'{up_streak[i]}连板'
+        else:
+            result[i] = f'{up_days[i]}天{up_num[i]}板'
+    for i in np.flatnonzero(last == DOWN_LIMIT):
+        result[i] = f'{down_streak[i]}连跌停板'
+    return result
@@ -0,0 +1,122 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from tushare_cache import CACHE_ROOT
+from tushare_client import get_pro_api
+from limit_status import classify_limit_status, NOT_TRADED
+
+
+class LimitStatusStore:
+    def __init__(self, pro=None, store_dir=None):
+        """
+        涨跌停状态历史库
+        每个交易日一个parquet文件，只保存ts_code和int8状态编码；
+        已保存的交易日不再请求接口，每天运行只需要拉取新增的一天
+        """
+        self.pro = pro or get_pro_api()
+        self.store_dir = store_dir or os.path.join(CACHE_ROOT, 'limit_status')
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, date):
+        return os.path.join(self.store_dir, f"{date}.parquet")
+
+    def has_date(self, date):
+        """判断某个交易日是否已经保存"""
+        return os.path.exists(self._path(date))
+
+    def missing_dates(self, dates):
+        """返回尚未保存的交易日"""
+        return [date for date in dates if not self.has_date(date)]
+
+    def fetch_date(self, date):
+        """
+        拉取某个交易日的涨跌停价和行情并判断状态
+        涨跌停价或行情任一尚未发布时返回None，不保存当天，下次运行时重新拉取；
+        否则缺少涨跌停价的一天会全部记为未涨跌停并被当作已完成的交易日
+        """
+        df_limit = self.pro.stk_limit(trade_date=date)
+        df_price = self.pro.daily(trade_date=date)
+        if df_limit.empty or df_price.empty:
+            return None
+        # 合并数据以便判断涨跌停状态
+        df_merged = pd.merge(df_price, df_limit, on=['ts_code', 'trade_date'], how='left')
+        return pd.DataFrame({
+            'ts_code': df_merged['ts_code'].to_numpy(),
+            'status': classify_limit_status(df_merged),
+        })
+
+    def save(self, date, status):
+        """写入某个交易日的状态，先写临时文件再替换，中断时不会留下不完整的文件"""
+        path = self._path(date)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        status.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._frames[date] = status
+
+    def _update_date(self, date):
+        """拉取并保存单个交易日，成功时返回True"""
+        status = self.fetch_date(date)
+        if status is None:
+            print(f"{date} 的行情或涨跌停价数据尚未发布，跳过")
+            return False
+        self.save(date, status)
+        return True
+
+    def update(self, dates, max_workers=1):
+        """
+        补齐缺失的交易日，返回本次新增的交易日
+        max_workers大于1时并发拉取，请求频率由共享的限流客户端控制；
+        每个交易日单独落盘，单日失败不影响其他日期，重新运行时只补缺失的日期
+        """
+        missing = self.missing_dates(dates)
+        added = []
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._update_date, date): date for date in missing}
+                for future in as_completed(futures):
+                    date = futures[future]
+                    try:
+                        if future.result():
+                            added.append(date)
+                    except Exception as e:
+                        print(f"{date} 的涨跌停状态获取失败: {e}")
+            added.sort()
+        else:
+            for date in missing:
+                if self._update_date(date):
+                    added.append(date)
+        print(f"涨跌停状态库已更新，请求{len(dates)}个交易日中的{len(added)}个")
+        return added
+
+    def load(self, date):
+        """读取某个交易日的状态，没有保存时返回None"""
+        with self._lock:
+            if date in self._frames:
+                return self._frames[date]
+        if not self.has_date(date):
+            return None
+        status = pd.read_parquet(self._path(date))
+        with self._lock:
+            self._frames[date] = status
+        return status
+
+    def status_matrix(self, dates, codes):
+        """
+        组成(股票 x 交易日)的int8状态矩阵，行顺序与codes一致，列顺序与dates一致
+        只包含库中已有的交易日，当天没有交易的股票记为NOT_TRADED
+        返回(矩阵, 实际包含的交易日列表)
+        """
+        codes = pd.Index(codes)
+        available = [date for date in dates if self.has_date(date) or date in self._frames]
+        matrix = np.full((len(codes), len(available)), NOT_TRADED, dtype=np.int8)
+        for j, date in enumerate(available):
+            status = self.load(date).drop_duplicates(subset='ts_code')
+            positions = pd.Index(status['ts_code']).get_indexer(codes)
+            found = positions >= 0
+            matrix[found, j] = status['status'].to_numpy()[positions[found]]
+        return matrix, available
@@ -9,7 +9,10 @@ import os
 import pandas as pd
 from datetime import datetime, timedelta
 from get_limit_status_data import get_limit_status_data
-from toplist_main import run_analysis
+from toplist_main import run_batch_analysis, BULK_MODE_MIN_STOCKS
+from trade_calendar import get_trade_calendar
+from chart_farm import ChartRenderFarm
+from content_integration import KLINE_MODE
 import sys
 
 def main():
@@ -19,8 +22,8 @@ def main():
     # 设置minus_days参数，控制获取哪天的数据
     minus_days =7  # 默认获取当天的数据，可以根据需要调整
     
-    # 获取目标日期
-    target_date = (datetime.now() - timedelta(days=minus_days)).strftime('%Y%m%d')
+    # 获取目标日期（非交易日时取之前最近的交易日）
+    target_date = get_trade_calendar().latest_trade_date(datetime.now() - timedelta(days=minus_days))
 
     print(f"正在获取{target_date}的涨跌停数据...")
 
@@ -168,24 +171,23 @@ def generate_reports_for_limit_stocks(df, date_str, selected_status,minus_days=0
     output_base_dir = "/Users/airry/PythonS/python_learn_company/result"
     output_date_dir = os.path.join(output_base_dir, date_str)
     os.makedirs(output_date_dir, exist_ok=True)
-
-    for index, row in selected_df.iterrows():
-        current_stock = index + 1
-        stock_code = row['ts_code']
-        stock_name = row['name']
-        consecutive_status = row['连板状态']
-
-        print(f"\n[{current_stock}/{total_stocks}] 正在处理: {stock_name}({stock_code}) - {consecutive_status}")
-
-        try:
-            # 调用toplist_main.py中的run_analysis函数生成报告
-            run_analysis(stock_name, stock_code, output_date_dir, index=index+1, minus_days=minus_days)
-        except Exception as e:
-            print(f"处理 {stock_name}({stock_code}) 时发生错误: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
-
+    bulk_mode = total_stocks >= BULK_MODE_MIN_STOCKS
+
+    # 先把所有股票的K线图提交到渲染进程池，与后续的数据提取和文本生成并行执行
+    # 浏览器端绘制K线图时不需要渲染进程池
+    chart_farm = None
+    if KLINE_MODE == 'image':
+        chart_farm = ChartRenderFarm()
+        chart_farm.submit_all(zip(selected_df['ts_code'], selected_df['name']))
+
+    # 调用toplist_main.py中的run_batch_analysis函数批量生成报告
+    stocks = [(index + 1, row['name'], row['ts_code']) for index, row in selected_df.iterrows()]
+    run_batch_analysis(stocks, output_date_dir, minus_days=minus_days, bulk_mode=bulk_mode, chart_farm=chart_farm,
+                       label_map=dict(zip(selected_df['ts_code'], selected_df['连板状态'])))
+
+    if chart_farm:
+        chart_farm.shutdown()
+        chart_farm.chart_cache.print_stats()
     print("="*60)
     print(f"连板状态为 '{selected_status}' 的股票报告生成完成！")
     print(f"总共处理了 {total_stocks} 只股票")
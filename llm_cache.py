@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import threading
+import datetime
+from tushare_cache import CACHE_ROOT
+
+
+# 各章节生成结果的有效秒数
+# 股东结构和收入结构依赖财报数据，缓存键包含压缩后的前十大股东和主营构成表格，
+# 新的报告期数据出现时缓存键随之变化，这里只设置一个较长的兜底有效期
+SECTION_TTL = {
+    'history_info': 180 * 24 * 3600,  # 公司历史沿革和创始人背景很少变化
+    'customer_sales_info': 30 * 24 * 3600,
+    'shareholders_info': 120 * 24 * 3600,
+    'income_structure_info': 120 * 24 * 3600,
+}
+
+
+class LLMCache:
+    def __init__(self, cache_dir=None):
+        """
+        大模型生成结果缓存
+        以(章节, 公司, 结构化输入的哈希, 模型, 字数限制)为键保存生成的内容，
+        同一公司再次出现且输入没有变化时直接复用，不再调用模型
+        """
+        self.cache_dir = cache_dir or os.path.join(CACHE_ROOT, 'llm')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def make_key(self, section, company_name, inputs, model, words_limit):
+        """由章节、公司、结构化输入、模型和字数限制生成缓存键"""
+        inputs_hash = hashlib.sha1(str(inputs).encode('utf-8')).hexdigest()
+        raw = json.dumps([section, company_name, inputs_hash, model, words_limit], ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """读取未过期的生成结果，未命中时返回None；文件损坏或缺少字段时按未命中处理"""
+        content = None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if datetime.datetime.now() < datetime.datetime.fromisoformat(entry['expires_at']):
+                content = entry['content']
+        except (OSError, ValueError, KeyError, TypeError):
+            content = None
+        with self._lock:
+            self._stats['hits' if content is not None else 'misses'] += 1
+        return content
+
+    def set(self, key, section, content):
+        """写入生成结果，按章节的有效期计算失效时间；没有配置有效期的章节不缓存"""
+        ttl = SECTION_TTL.get(section)
+        if ttl is None:
+            return
+        now = datetime.datetime.now()
+        expires_at = now + datetime.timedelta(seconds=ttl)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'section': section, 'created_at': now.isoformat(), 'expires_at': expires_at.isoformat(),
+                       'content': content}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get_stats(self):
+        """返回命中和未命中次数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self):
+        """打印生成结果缓存统计"""
+        stats = self.get_stats()
+        print(f"大模型结果缓存统计: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次")
+
+
+_default_llm_cache = None
+_default_llm_cache_lock = threading.Lock()
+
+
+def get_default_llm_cache():
+    """获取进程内共享的大模型结果缓存"""
+    global _default_llm_cache
+    with _default_llm_cache_lock:
+        if _default_llm_cache is None:
+            _default_llm_cache = LLMCache()
+        return _default_llm_cache
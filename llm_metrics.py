@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import threading
+import datetime
+from tushare_cache import CACHE_ROOT
+
+
+# 各模型每千token的价格（元），格式为[输入价格, 输出价格]，未列出的模型不计算费用；
+# 可以通过环境变量LLM_MODEL_PRICES修改，格式为JSON，例如{"qwen-plus": [0.0008, 0.002]}
+LLM_MODEL_PRICES = {
+    'qwen-plus': [0.0008, 0.002],
+    'doubao-seed-1-6-251015': [0.0008, 0.008],
+    'kimi-k2-thinking': [0.004, 0.016],
+}
+LLM_MODEL_PRICES.update(json.loads(os.environ.get('LLM_MODEL_PRICES', '{}')))
+
+
+class LLMCall:
+    def __init__(self, provider, model, section=None, company_name=None):
+        """
+        一次大模型调用的记录，由LLMMetrics.track创建
+        调用方在拿到响应后设置token用量、首个token时间、重试次数和错误信息
+        """
+        self.provider = provider
+        self.model = model
+        self.section = section
+        self.company_name = company_name
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.retries = 0
+        self.error = None
+        self._start = time.perf_counter()
+        self._first_token = None
+
+    def mark_first_token(self):
+        """记录收到第一个token的时间；非流式调用在收到完整响应时记录，与总耗时相同"""
+        if self._first_token is None:
+            self._first_token = time.perf_counter()
+
+    def set_usage(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    def to_record(self, end):
+        price = LLM_MODEL_PRICES.get(self.model)
+        cost = None
+        if price and self.prompt_tokens is not None and self.completion_tokens is not None:
+            cost = round((self.prompt_tokens * price[0] + self.completion_tokens * price[1]) / 1000, 6)
+        ttft = None if self._first_token is None else round(self._first_token - self._start, 3)
+        return {
+            'provider': self.provider,
+            'model': self.model,
+            'section': self.section,
+            'company_name': self.company_name,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'ttft': ttft,
+            'latency': round(end - self._start, 3),
+            'retries': self.retries,
+            'error': self.error,
+            'cost': cost,
+        }
+
+
+class LLMMetrics:
+    def __init__(self, metrics_dir=None):
+        """
+        大模型调用指标
+        每次调用追加一行JSON到metrics目录下按日期命名的文件，本次运行的记录同时保存在内存中用于打印汇总
+        """
+        self.metrics_dir = metrics_dir or os.path.join(CACHE_ROOT, 'metrics')
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        self.run_id = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._records = []
+
+    def track(self, provider, model, section=None, company_name=None):
+        """
+        记录一次调用的上下文管理器：
+            with metrics.track('qwen', model, section) as call:
+                response = ...
+                call.mark_first_token()
+                call.set_usage(input_tokens, output_tokens)
+        调用抛出异常时记录错误信息后继续抛出
+        """
+        return _TrackedCall(self, LLMCall(provider, model, section, company_name))
+
+    def record(self, call):
+        """保存一次调用的记录，写入指标文件失败时只打印提示，不影响调用结果"""
+        record = call.to_record(time.perf_counter())
+        record['time'] = datetime.datetime.now().isoformat(timespec='seconds')
+        record['run_id'] = self.run_id
+        path = os.path.join(self.metrics_dir, f"llm_calls_{datetime.date.today():%Y%m%d}.jsonl")
+        with self._lock:
+            self._records.append(record)
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"大模型调用指标写入失败: {e}")
+
+    def get_summary(self):
+        """按(服务商, 模型, 章节)汇总本次运行的调用次数、错误次数、token用量、耗时和费用"""
+        with self._lock:
+            records = list(self._records)
+        summary = {}
+        for record in records:
+            key = (record['provider'], record['model'], record['section'])
+            item = summary.setdefault(key, {'calls': 0, 'errors': 0, 'retries': 0, 'prompt_tokens': 0,
+                                            'completion_tokens': 0, 'latency': 0.0, 'max_latency': 0.0, 'cost': 0.0})
+            item['calls'] += 1
+            item['errors'] += record['error'] is not None
+            item['retries'] += record['retries']
+            item['prompt_tokens'] += record['prompt_tokens'] or 0
+            item['completion_tokens'] += record['completion_tokens'] or 0
+            item['latency'] += record['latency']
+            item['max_latency'] = max(item['max_latency'], record['latency'])
+            item['cost'] += record['cost'] or 0
+        return summary
+
+    def print_summary(self):
+        """打印本次运行的大模型调用汇总，按累计耗时从高到低排列"""
+        summary = self.get_summary()
+        if not summary:
+            return
+        print("大模型调用统计:")
+        items = sorted(summary.items(), key=lambda kv: kv[1]['latency'], reverse=True)
+        for (provider, model, section), item in items:
+            print(f"  {provider}/{model} [{section or '-'}]: {item['calls']} 次, 错误 {item['errors']} 次, "
+                  f"重试 {item['retries']} 次, token {item['prompt_tokens']}+{item['completion_tokens']}, "
+                  f"累计耗时 {item['latency']:.1f}s, 平均 {item['latency'] / item['calls']:.1f}s, "
+                  f"最长 {item['max_latency']:.1f}s, 费用 {item['cost']:.4f} 元")
+        total_cost = sum(item['cost'] for item in summary.values())
+        total_calls = sum(item['calls'] for item in summary.values())
+        print(f"  合计: {total_calls} 次调用, 费用 {total_cost:.4f} 元")
+
+
+class _TrackedCall:
+    def __init__(self, metrics, call):
+        self._metrics = metrics
+        self._call = call
+
+    def __enter__(self):
+        return self._call
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self._call.error is None:
+            self._call.error = f"{exc_type.__name__}: {exc}"
+        self._metrics.record(self._call)
+        return False
+
+
+_default_llm_metrics = None
+_default_llm_metrics_lock = threading.Lock()
+
+
+def get_default_llm_metrics():
+    """获取进程内共享的大模型调用指标"""
+    global _default_llm_metrics
+    with _default_llm_metrics_lock:
+        if _default_llm_metrics is None:
+            _default_llm_metrics = LLMMetrics()
+        return _default_llm_metrics
@@ -37,6 +37,7 @@ def run_analysis(company_name, stock_code):
             financial_data=financial_data,
             management_info=management_info
         )
+        text_generator.llm_metrics.print_summary()
         
         # 4. 整合内容 (使用ContentIntegrator)
         print("步骤4: 整合内容并生成报告...")
@@ -0,0 +1,123 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from tushare_cache import CACHE_ROOT
+from tushare_client import get_pro_api
+
+
+# 行情库保存的字段
+PRICE_FIELDS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'vol', 'amount', 'adj_factor']
+
+# 补齐缺失交易日时并发拉取的线程数，首次运行需要回补整个K线区间
+UPDATE_WORKERS = 8
+
+
+class PriceStore:
+    def __init__(self, pro=None, store_dir=None):
+        """
+        全市场日线行情库
+        每个交易日调用一次daily和adj_factor拉取全部股票，按交易日保存为parquet文件；
+        单只股票的K线数据直接从本地切片得到，不再按股票请求接口
+        """
+        self.pro = pro or get_pro_api()
+        self.store_dir = store_dir or os.path.join(CACHE_ROOT, 'daily')
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._unavailable = set()
+        self._window = None
+        self._lock = threading.Lock()
+
+    def _path(self, date):
+        return os.path.join(self.store_dir, f"{date}.parquet")
+
+    def has_date(self, date):
+        """判断某个交易日是否已经保存"""
+        return os.path.exists(self._path(date))
+
+    def fetch_date(self, date):
+        """拉取某个交易日的全市场行情和复权因子，当天数据尚未发布时返回None"""
+        df_price = self.pro.daily(trade_date=date, fields='ts_code,trade_date,open,high,low,close,vol,amount')
+        if df_price.empty:
+            return None
+        df_adj = self.pro.adj_factor(trade_date=date, fields='ts_code,trade_date,adj_factor')
+        if df_adj.empty:
+            return None
+        return df_price.merge(df_adj, on=['ts_code', 'trade_date'], how='left')[PRICE_FIELDS]
+
+    def save(self, date, data):
+        """写入某个交易日的行情，先写临时文件再替换"""
+        path = self._path(date)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def _update_date(self, date):
+        data = self.fetch_date(date)
+        if data is None:
+            return False
+        self.save(date, data)
+        return True
+
+    def update(self, dates, max_workers=1):
+        """补齐缺失的交易日，返回本次新增的交易日；本进程内已确认未发布的交易日不再重复请求"""
+        missing = [date for date in dates if not self.has_date(date) and date not in self._unavailable]
+        added = []
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._update_date, date): date for date in missing}
+                for future in as_completed(futures):
+                    date = futures[future]
+                    try:
+                        if future.result():
+                            added.append(date)
+                        else:
+                            self._unavailable.add(date)
+                    except Exception as e:
+                        print(f"{date} 的日线行情获取失败: {e}")
+            added.sort()
+        else:
+            for date in missing:
+                if self._update_date(date):
+                    added.append(date)
+                else:
+                    self._unavailable.add(date)
+        if added:
+            self._window = None
+            print(f"日线行情库已更新，新增{len(added)}个交易日")
+        return added
+
+    def _load_window(self, dates):
+        """读取一组交易日的行情，合并后按ts_code建立索引，同一组交易日只读取一次"""
+        dates = tuple(dates)
+        if self._window is not None and self._window[0] == dates:
+            return self._window[1]
+        frames = [pd.read_parquet(self._path(date)) for date in dates if self.has_date(date)]
+        frames = [frame for frame in frames if not frame.empty]
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PRICE_FIELDS)
+        # 按ts_code排序建立索引，单只股票切片时只需二分查找
+        combined = combined.sort_values(by=['ts_code', 'trade_date']).set_index('ts_code', drop=False)
+        self._window = (dates, combined)
+        return combined
+
+    def stock_history(self, stock_code, dates):
+        """
+        返回单只股票在dates范围内的日线行情和复权因子（按日期升序）
+        缺失的交易日会先从接口补齐
+        """
+        with self._lock:
+            self.update(dates, max_workers=UPDATE_WORKERS)
+            frame = self._load_window(dates)
+        return frame.loc[stock_code:stock_code].reset_index(drop=True)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_price_store():
+    """获取进程内共享的行情库，批量生成报告时所有股票共用同一份内存数据"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PriceStore()
+        return _default_store
@@ -0,0 +1,131 @@
+import pandas as pd
+
+
+# 各章节提示词中结构化数据部分的token预算，超出时从表格末尾（较早或较次要的记录）开始删减
+PROMPT_TOKEN_BUDGETS = {
+    'income_structure_info': 1200,
+    'history_info': 1000,
+    'shareholders_info': 800,
+}
+
+# 管理层简历截断后保留的字数
+RESUME_MAX_CHARS = 120
+
+# 主营业务构成保留的报告期数和每个报告期的业务项目数
+MAIN_BZ_PERIODS = 3
+MAIN_BZ_ITEMS_PER_PERIOD = 8
+
+# 前十大股东保留的报告期数，保留两期以便说明持股变动
+HOLDERS_PERIODS = 2
+
+# 管理层信息最多保留的人数
+MANAGEMENT_MAX_ROWS = 10
+
+
+def estimate_tokens(text):
+    """
+    粗略估计文本的token数
+    汉字等非ASCII字符约1个token，ASCII字符约4个字符1个token
+    """
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def truncate_text(text, max_chars):
+    """截断过长的文本，截断时以省略号结尾"""
+    if text is None or pd.isna(text):
+        return ''
+    text = ' '.join(str(text).split())
+    return text if len(text) <= max_chars else text[:max_chars] + '…'
+
+
+def _format_cell(value):
+    """单元格格式化：缺失值为空，整数值的浮点数去掉小数点，去掉会破坏表格结构的分隔符和换行"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return ' '.join(str(value).replace('|', '/').split())
+
+
+def compact_table(df, columns=None, max_rows=None, token_budget=None, digits=2):
+    """
+    把DataFrame压缩为紧凑的竖线分隔表格文本，第一行为表头
+    columns: 保留的列，可以是列名列表或{原列名: 输出列名}，缺失的列自动跳过
+    只保留去重后的前max_rows行，数值按digits位小数四舍五入；
+    超出token_budget时从末尾删行，至少保留一行数据
+    """
+    if df is None or df.empty:
+        return ''
+    if columns is None:
+        columns = list(df.columns)
+    if not isinstance(columns, dict):
+        columns = {col: col for col in columns}
+    columns = {col: name for col, name in columns.items() if col in df.columns}
+
+    table = df[list(columns)].drop_duplicates()
+    if max_rows is not None:
+        table = table.head(max_rows)
+    numeric = table.select_dtypes('number').columns
+    if len(numeric):
+        table = table.copy()
+        table[numeric] = table[numeric].round(digits)
+
+    header = '|'.join(columns.values())
+    rows = ['|'.join(_format_cell(value) for value in row) for row in table.itertuples(index=False)]
+    if token_budget is not None:
+        used = estimate_tokens(header)
+        for count, row in enumerate(rows):
+            used += estimate_tokens(row) + 1
+            if used > token_budget and count > 0:
+                rows = rows[:count]
+                break
+    return '\n'.join([header] + rows)
+
+
+def compact_main_business(main_bz_composition):
+    """主营业务构成：最近几个报告期中收入最高的业务项目"""
+    df = main_bz_composition
+    if '报告期' in df.columns:
+        periods = sorted(df['报告期'].dropna().unique(), reverse=True)[:MAIN_BZ_PERIODS]
+        df = df[df['报告期'].isin(periods)]
+        if '业务收入' in df.columns:
+            df = df.sort_values(by=['报告期', '业务收入'], ascending=[False, False])
+        df = df.groupby('报告期', sort=False).head(MAIN_BZ_ITEMS_PER_PERIOD)
+    columns = {'报告期': '报告期', '业务项目': '业务项目', '业务收入': '业务收入(亿元)',
+               '收入占比': '收入占比(%)', '毛利率': '毛利率(%)'}
+    if not any(col in df.columns for col in columns):
+        columns = None
+    return compact_table(df, columns, token_budget=PROMPT_TOKEN_BUDGETS['income_structure_info'], digits=1)
+
+
+def compact_management(management_info):
+    """管理层信息：优先保留在任人员，同一人的多个职务合并为一行，简历截断"""
+    df = management_info
+    if 'end_date' in df.columns:
+        current = df[df['end_date'].isna()]
+        if not current.empty:
+            df = current
+    df = df.copy()
+    if 'resume' in df.columns:
+        df['resume'] = df['resume'].map(lambda resume: truncate_text(resume, RESUME_MAX_CHARS))
+    if 'name' in df.columns and 'title' in df.columns:
+        aggregations = {col: 'first' for col in df.columns if col != 'name'}
+        aggregations['title'] = lambda titles: '、'.join(dict.fromkeys(titles.dropna().astype(str)))
+        df = df.groupby('name', sort=False).agg(aggregations).reset_index()
+    columns = {'name': '姓名', 'title': '职务', 'edu': '学历', 'birthday': '出生日期',
+               'begin_date': '任职起始', 'resume': '简历'}
+    return compact_table(df, columns, max_rows=MANAGEMENT_MAX_ROWS, token_budget=PROMPT_TOKEN_BUDGETS['history_info'])
+
+
+def compact_holders(top10_holders_data):
+    """前十大股东：最近两个报告期，按持股比例降序"""
+    df = top10_holders_data
+    if 'end_date' in df.columns:
+        periods = sorted(df['end_date'].dropna().unique(), reverse=True)[:HOLDERS_PERIODS]
+        df = df[df['end_date'].isin(periods)]
+        if 'hold_ratio' in df.columns:
+            df = df.sort_values(by=['end_date', 'hold_ratio'], ascending=[False, False])
+    columns = {'end_date': '报告期', 'holder_name': '股东名称', 'hold_ratio': '持股比例(%)',
+               'hold_change': '持股变动(股)', 'holder_type': '股东类型'}
+    return compact_table(df, columns, token_budget=PROMPT_TOKEN_BUDGETS['shareholders_info'])
@@ -0,0 +1,38 @@
+import time
+import threading
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        """
+        令牌桶限流器
+        rate_per_minute: 每分钟补充的令牌数，即每分钟允许的调用次数
+        capacity: 桶容量，即允许的瞬时突发次数，默认为每分钟调用次数的十分之一；
+                  任意60秒内最多调用capacity + rate_per_minute次，容量等于每分钟调用次数时首分钟会接近限额的两倍
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, rate_per_minute // 10)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        预定一个令牌，返回需要等待的秒数
+        令牌不足时允许记为负数，后续调用者依次排队等待
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到获得一个令牌，返回实际等待的秒数"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,84 @@
+import os
+import threading
+import requests
+from tushare_cache import CACHE_ROOT
+from report_templates import REPORT_CSS, CHART_RENDERER_JS
+
+
+# 图表库下载地址，可以通过环境变量CHART_JS_URL修改；下载一次后保存在缓存目录，报告目录中使用本地副本
+CHART_JS_URL = os.environ.get('CHART_JS_URL', 'https://cdn.jsdelivr.net/npm/chart.js@4/dist/chart.umd.min.js')
+
+# 报告目录下存放共享资源的子目录，报告中用相对路径引用
+ASSETS_DIRNAME = 'assets'
+CHART_LIB_FILENAME = 'chart.umd.min.js'
+
+_chart_lib_lock = threading.Lock()
+_chart_lib = None
+_chart_lib_checked = False
+
+_prepared_lock = threading.Lock()
+_prepared = {}
+
+
+def _write_if_changed(path, content):
+    """内容有变化时才写入，先写临时文件再替换"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def get_chart_lib():
+    """
+    返回图表库内容，首次调用时下载并保存到缓存目录
+    下载失败时返回None，本进程内不再重试
+    """
+    global _chart_lib, _chart_lib_checked
+    with _chart_lib_lock:
+        if _chart_lib_checked:
+            return _chart_lib
+        _chart_lib_checked = True
+        cache_dir = os.path.join(CACHE_ROOT, 'assets')
+        path = os.path.join(cache_dir, CHART_LIB_FILENAME)
+        if not os.path.exists(path):
+            try:
+                response = requests.get(CHART_JS_URL, timeout=30)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"下载图表库失败，报告将从CDN加载: {e}")
+                return None
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_if_changed(path, response.content)
+        with open(path, 'rb') as f:
+            _chart_lib = f.read()
+        return _chart_lib
+
+
+def prepare_report_assets(output_dir):
+    """
+    在报告目录下写入共享的样式表、图表库和图表渲染脚本，同一目录在本进程内只写一次
+    返回报告中引用图表库的地址：本地副本的相对路径，图表库不可用时为CDN地址
+    """
+    output_dir = os.path.abspath(output_dir)
+    with _prepared_lock:
+        if output_dir in _prepared:
+            return _prepared[output_dir]
+
+    assets_dir = os.path.join(output_dir, ASSETS_DIRNAME)
+    os.makedirs(assets_dir, exist_ok=True)
+    _write_if_changed(os.path.join(assets_dir, 'report.css'), REPORT_CSS.encode('utf-8'))
+    _write_if_changed(os.path.join(assets_dir, 'report-charts.js'), CHART_RENDERER_JS.encode('utf-8'))
+    chart_lib = get_chart_lib()
+    if chart_lib is not None:
+        _write_if_changed(os.path.join(assets_dir, CHART_LIB_FILENAME), chart_lib)
+        chart_lib_src = f"{ASSETS_DIRNAME}/{CHART_LIB_FILENAME}"
+    else:
+        chart_lib_src = CHART_JS_URL
+
+    with _prepared_lock:
+        _prepared[output_dir] = chart_lib_src
+    return chart_lib_src
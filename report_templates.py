@@ -0,0 +1,219 @@
+import os
+import json
+import threading
+from string import Template
+
+
+# 报告页面样式，写入报告目录下的assets/report.css
+REPORT_CSS = """body { font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }
+h1, h2, h3 { color: #333; }
+h1 { border-bottom: 2px solid #333; padding-bottom: 10px; }
+table { border-collapse: collapse; width: 100%; margin: 10px 0; }
+th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+th { background-color: #f2f2f2; }
+.section { margin: 20px 0; }
+.subsection { margin: 15px 0; }
+.chart-container { position: relative; height: 400px; width: 100%; margin: 20px 0; }
+.kline-image { width: 100%; max-width: 1000px; height: auto; margin: 20px 0; }
+.detail-link { display: inline-block; padding: 8px 16px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 4px; margin-top: 10px; }
+strong { color: #444; }
+"""
+
+# 图表渲染脚本，写入报告目录下的assets/report-charts.js，当天所有报告中的图表共用
+# 每个图表只嵌入一份由Python生成的配置（标签、数据、样式名、坐标轴和标题），颜色和通用选项在这里统一设置
+CHART_RENDERER_JS = """const CHART_STYLES = {
+    bar: { backgroundColor: "rgba(87, 160, 229, 1)", borderColor: "rgba(87, 160, 229, 1)", borderWidth: 2 },
+    blue: { borderColor: "rgba(87, 160, 229, 1)", backgroundColor: "rgba(87, 160, 229, 1)", pointBackgroundColor: "rgba(87, 160, 229, 1)", borderWidth: 3, pointRadius: 5 },
+    yellow: { borderColor: "rgba(249, 217, 137, 1)", backgroundColor: "rgba(249, 217, 137, 1)", pointBackgroundColor: "rgba(249, 217, 137, 1)", borderWidth: 3, pointRadius: 5 },
+    growth: { borderColor: "rgba(249, 217, 137, 1)", backgroundColor: "rgba(249, 217, 137, 1)", pointBackgroundColor: "rgba(255, 152, 0, 1)", borderWidth: 3, pointRadius: 5 },
+    pink: { borderColor: "rgba(241, 138, 158, 1)", backgroundColor: "rgba(241, 138, 158, 1)", pointBackgroundColor: "rgba(241, 138, 158, 1)", borderWidth: 2, pointRadius: 4 }
+};
+
+function whenReady(callback) {
+    if (document.readyState === "loading") {
+        document.addEventListener("DOMContentLoaded", callback);
+    } else {
+        callback();
+    }
+}
+
+function renderChart(id, spec) {
+    whenReady(function() {
+        const datasets = spec.datasets.map(function(ds) {
+            const dataset = Object.assign({ label: ds.label, data: ds.data }, CHART_STYLES[ds.style]);
+            if (ds.style !== "bar") {
+                // 折线：透明数据点边框、不填充、平滑曲线
+                Object.assign(dataset, { type: "line", pointBorderColor: "rgba(255, 255, 255, 0)", fill: false, tension: 0.4 });
+            }
+            if (ds.axis) dataset.yAxisID = ds.axis;
+            if (ds.order !== undefined) dataset.order = ds.order;
+            return dataset;
+        });
+        // 禁用x轴网格线（纵向线不显示）
+        const scales = { x: { grid: { display: false } } };
+        spec.axes.forEach(function(axis) {
+            const scale = { title: { display: true, text: axis.title } };
+            if (axis.position) scale.position = axis.position;
+            // 右侧副坐标轴不在图表区域绘制网格线
+            if (axis.secondary) scale.grid = { drawOnChartArea: false };
+            scales[axis.id] = scale;
+        });
+        new Chart(document.getElementById(id).getContext("2d"), {
+            type: spec.type,
+            data: { labels: spec.labels, datasets: datasets },
+            options: {
+                responsive: true,
+                scales: scales,
+                plugins: {
+                    title: { display: true, text: spec.title },
+                    legend: { display: true, position: "top" }
+                }
+            }
+        });
+    });
+}
+
+function renderKline(id, d, title) {
+    whenReady(function() {
+        // 收盘价大于等于开盘价为涨（红色），否则为跌（绿色）
+        const colors = d.close.map((c, i) => c >= d.open[i] ? "red" : "green");
+        const labels = d.dates.map(date => date.slice(5));
+        new Chart(document.getElementById(id + "Price").getContext("2d"), {
+            data: {
+                labels: labels,
+                datasets: [
+                    { type: "line", label: "5日均线", data: d.ma5, borderColor: "orange", borderWidth: 1, pointRadius: 0 },
+                    { type: "line", label: "20日均线", data: d.ma20, borderColor: "purple", borderWidth: 1, pointRadius: 0 },
+                    // 最高价到最低价的影线
+                    { type: "bar", label: "影线", data: d.low.map((l, i) => [l, d.high[i]]), backgroundColor: colors, barPercentage: 0.1, grouped: false },
+                    // 开盘价到收盘价的实体，开收盘相同时至少显示1像素
+                    { type: "bar", label: "K线", data: d.open.map((o, i) => [o, d.close[i]]), backgroundColor: colors, barPercentage: 0.8, grouped: false, minBarLength: 1 }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                animation: false,
+                scales: { x: { grid: { display: false } }, y: { title: { display: true, text: "价格" } } },
+                plugins: {
+                    title: { display: true, text: title },
+                    legend: { labels: { filter: item => item.text.includes("均线") } }
+                }
+            }
+        });
+        new Chart(document.getElementById(id + "Amount").getContext("2d"), {
+            type: "bar",
+            data: { labels: labels, datasets: [{ label: "成交额(亿元)", data: d.amount, backgroundColor: colors }] },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                animation: false,
+                scales: { x: { grid: { display: false } }, y: { title: { display: true, text: "成交额(亿元)" } } },
+                plugins: { legend: { display: false } }
+            }
+        });
+    });
+}
+"""
+
+# 报告页面模板
+REPORT_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+    <link rel="stylesheet" href="assets/report.css">
+    <script src="$chart_lib"></script>
+    <script src="assets/report-charts.js"></script>
+</head>
+<body>
+$body
+</body>
+</html>
+""")
+
+SECTION_TEMPLATE = Template("""    <div class="section">
+        <h2>$title</h2>
+$content
+    </div>""")
+
+SUBSECTION_TEMPLATE = Template("""        <div class="subsection">
+            <h3>$title</h3>
+$content
+        </div>""")
+
+# 图表组件：一个画布加一行调用共用渲染脚本的代码，配置由json.dumps生成
+CHART_TEMPLATE = Template("""        <div class="chart-container"><canvas id="$chart_id"></canvas></div>
+        <script>renderChart("$chart_id", $spec);</script>""")
+
+KLINE_CHART_TEMPLATE = Template("""        <div class="chart-container"><canvas id="${chart_id}Price"></canvas></div>
+        <div class="chart-container" style="height: 150px;"><canvas id="${chart_id}Amount"></canvas></div>
+        <script>renderKline("$chart_id", $data, $title);</script>""")
+
+
+def script_json(value):
+    """序列化为可以直接嵌入<script>标签的紧凑JSON，转义</避免提前结束标签"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+def render_chart(chart_id, spec):
+    """
+    渲染一个图表组件
+    spec: {'type', 'title', 'labels', 'datasets': [{'label', 'data', 'style', 'axis', 'order'}],
+           'axes': [{'id', 'title', 'position', 'secondary'}]}，样式名见CHART_STYLES
+    """
+    return CHART_TEMPLATE.substitute(chart_id=chart_id, spec=script_json(spec))
+
+
+def render_kline_chart(chart_id, data, title):
+    """渲染浏览器端绘制的K线图组件，data为kline_chart_data生成的行情数组"""
+    return KLINE_CHART_TEMPLATE.substitute(chart_id=chart_id, data=script_json(data), title=script_json(title))
+
+
+def render_section(title, content):
+    return SECTION_TEMPLATE.substitute(title=title, content=content)
+
+
+def render_subsection(title, content):
+    return SUBSECTION_TEMPLATE.substitute(title=title, content=content)
+
+
+# 流式写入时先写页面模板中$body之前的部分，各部分内容写完后再写结尾
+_REPORT_HEAD, _REPORT_TAIL = REPORT_TEMPLATE.template.split('$body')
+REPORT_HEAD_TEMPLATE = Template(_REPORT_HEAD)
+REPORT_TAIL = _REPORT_TAIL
+
+
+def render_report_head(title, chart_lib):
+    """
+    渲染报告页面的开头部分
+    样式表和图表渲染脚本由report_assets写入报告目录下的assets，chart_lib为图表库地址
+    """
+    return REPORT_HEAD_TEMPLATE.substitute(title=title, chart_lib=chart_lib)
+
+
+def write_report(filepath, title, chart_lib, sections):
+    """
+    流式写入报告：sections按顺序逐个生成，每生成一部分就写入临时文件并刷新，
+    生成过程中可以直接查看临时文件中已经完成的部分；全部写完后替换为正式文件，出错时删除临时文件
+    """
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(render_report_head(title, chart_lib))
+            first = True
+            for section in sections:
+                if not section:
+                    continue
+                if not first:
+                    f.write('\n')
+                f.write(section)
+                f.flush()
+                first = False
+            f.write(REPORT_TAIL)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
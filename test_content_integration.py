@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from content_integration import ContentIntegrator
+
+
+def old_df_to_html_table(df):
+    """改写前逐行拼接的表格渲染，不做转义"""
+    if df.empty:
+        return "<p>暂无数据</p>"
+    html_table = ["    <table>", "        <thead>", "            <tr>"]
+    for col in df.columns:
+        html_table.append(f"                <th>{col}</th>")
+    html_table += ["            </tr>", "        </thead>", "        <tbody>"]
+    for _, row in df.iterrows():
+        html_table.append("            <tr>")
+        for cell in row:
+            cell_value = str(cell) if pd.notna(cell) else 'N/A'
+            html_table.append(f"                <td>{cell_value}</td>")
+        html_table.append("            </tr>")
+    html_table += ["        </tbody>", "    </table>"]
+    return "\n".join(html_table)
+
+
+def render_table(df):
+    # 只测试表格渲染，不创建报告目录
+    return ContentIntegrator.__new__(ContentIntegrator)._df_to_html_table(df)
+
+
+def test_matches_row_wise_rendering():
+    df = pd.DataFrame({
+        '报告期': ['20241231', '20231231', None],
+        '营业收入(亿元)': [12.5, np.nan, 3.0],
+        '净利润(亿元)': [1.2, -0.3, np.nan],
+    })
+    assert render_table(df) == old_df_to_html_table(df)
+
+
+def test_missing_values_render_as_na():
+    df = pd.DataFrame({'名称': ['甲', None, np.nan], '数值': [1.5, np.nan, None], '标志': pd.array([1, None, 3], dtype='Int64')})
+    html = render_table(df)
+    assert html.count('<td>N/A</td>') == 5
+    assert '<td>1.5</td>' in html
+    assert '<td>3</td>' in html
+
+
+def test_text_cells_are_escaped():
+    df = pd.DataFrame({'股东名称<a>': ['<script>alert(1)</script>', 'A & B'], '持股比例': [1.0, 2.0]})
+    html = render_table(df)
+    assert '<script>' not in html
+    assert '<td>&lt;script&gt;alert(1)&lt;/script&gt;</td>' in html
+    assert '<td>A &amp; B</td>' in html
+    assert '<th>股东名称&lt;a&gt;</th>' in html
+
+
+def test_empty_frame():
+    assert render_table(pd.DataFrame()) == "<p>暂无数据</p>"
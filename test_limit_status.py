@@ -0,0 +1,108 @@
+import datetime
+import numpy as np
+import pandas as pd
+from limit_status import classify_limit_status, consecutive_status, STATUS_LABELS, NOT_TRADED
+
+
+def old_judge_limit_status(row):
+    """改写前get_limit_status_data中逐行判断涨跌停状态的函数"""
+    if pd.isna(row['up_limit']) or pd.isna(row['down_limit']):
+        return '未涨跌停'
+    if row['close'] >= row['up_limit']:
+        return '涨停'
+    elif row['close'] <= row['down_limit']:
+        return '跌停'
+    elif row['high'] >= row['up_limit'] and row['close'] < row['up_limit']:
+        if row['change'] >= 0:
+            return '炸板'
+        else:
+            return '大面'
+    elif row['low'] <= row['down_limit'] and row['close'] > row['down_limit']:
+        if row['change'] <= 0:
+            return '翘板'
+        else:
+            return '反攻'
+    else:
+        return '未涨跌停'
+
+
+def old_judge_consecutive_status(row, target_date, day_range):
+    """改写前逐行判断连板状态的函数，row为ts_code、name加上按日期升序的状态列"""
+    date = target_date.strftime('%Y%m%d')
+    if row[date] in ('未涨跌停', '炸板', '翘板', '反攻', '大面'):
+        return row[date]
+    elif row[date] == '涨停':
+        count = 0
+        for i in range(day_range):
+            check_date = (target_date - datetime.timedelta(days=i)).strftime('%Y%m%d')
+            if check_date in row and row[check_date] == '涨停':
+                count += 1
+            else:
+                break
+        up_limit_num = row.eq('涨停').sum()
+        up_limit_days = len(row) - row.eq('涨停').argmax()
+        if up_limit_num == 1:
+            return '首板'
+        elif count == up_limit_num:
+            return f'{count}连板'
+        else:
+            return f'{up_limit_days}天{up_limit_num}板'
+    elif row[date] == '跌停':
+        count = 0
+        for i in range(day_range):
+            check_date = (target_date - datetime.timedelta(days=i)).strftime('%Y%m%d')
+            if check_date in row and row[check_date] == '跌停':
+                count += 1
+            else:
+                break
+        return f'{count}连跌停板'
+
+
+def random_quotes(rng, n):
+    """生成随机行情，收盘价、最高价、最低价和涨跌停价中混入缺失值"""
+    pre_close = rng.uniform(5, 50, n)
+    up_limit = np.round(pre_close * 1.1, 2)
+    down_limit = np.round(pre_close * 0.9, 2)
+    low = np.round(pre_close * rng.uniform(0.88, 1.0, n), 2)
+    high = np.round(pre_close * rng.uniform(1.0, 1.12, n), 2)
+    close = np.round(rng.uniform(low, high), 2)
+    # 一部分行收在涨跌停价上
+    pinned = rng.random(n)
+    close = np.where(pinned < 0.15, up_limit, np.where(pinned > 0.9, down_limit, close))
+    df = pd.DataFrame({'close': close, 'high': np.maximum(high, close), 'low': np.minimum(low, close),
+                       'change': np.round(close - pre_close, 2), 'up_limit': up_limit, 'down_limit': down_limit})
+    for col in df.columns:
+        df.loc[rng.random(n) < 0.05, col] = np.nan
+    return df
+
+
+def test_classify_limit_status_matches_row_wise():
+    rng = np.random.default_rng(0)
+    df = random_quotes(rng, 5000)
+    expected = df.apply(old_judge_limit_status, axis=1).tolist()
+    actual = [STATUS_LABELS[code] for code in classify_limit_status(df)]
+    assert actual == expected
+
+
+def test_missing_close_is_no_limit():
+    df = pd.DataFrame({'close': [np.nan], 'high': [11.0], 'low': [8.9], 'change': [0.0],
+                       'up_limit': [11.0], 'down_limit': [9.0]})
+    assert STATUS_LABELS[classify_limit_status(df)[0]] == '未涨跌停'
+
+
+def test_consecutive_status_matches_row_wise():
+    rng = np.random.default_rng(1)
+    day_range = 10
+    target_date = datetime.datetime(2025, 3, 20)
+    dates = [(target_date - datetime.timedelta(days=i)).strftime('%Y%m%d') for i in reversed(range(day_range))]
+    # 涨停和跌停的比例调高，覆盖首板、连板、N天M板和连跌停
+    codes = list(STATUS_LABELS) + [NOT_TRADED]
+    weights = np.array([0.3, 0.3, 0.15, 0.05, 0.05, 0.05, 0.05, 0.05])
+    matrix = rng.choice(codes, size=(3000, day_range), p=weights / weights.sum()).astype(np.int8)
+
+    labels = pd.DataFrame(matrix, columns=dates).apply(lambda col: col.map(STATUS_LABELS))
+    table = pd.concat([pd.DataFrame({'ts_code': range(len(matrix)), 'name': 'x'}), labels], axis=1)
+    expected = table.apply(old_judge_consecutive_status, axis=1, args=(target_date, day_range)).tolist()
+    # 最后一天未交易时旧函数返回None，apply后变成NaN
+    expected = [None if pd.isna(label) else label for label in expected]
+    assert list(consecutive_status(matrix)) == expected
@@ -0,0 +1,61 @@
+import pandas as pd
+from limit_status import UP_LIMIT, NO_LIMIT, NOT_TRADED
+from limit_status_store import LimitStatusStore
+
+
+class FakePro:
+    """按交易日返回行情和涨跌停价的假接口，unpublished中的日期没有涨跌停价"""
+
+    def __init__(self, unpublished=()):
+        self.unpublished = set(unpublished)
+        self.requested = []
+
+    def daily(self, trade_date):
+        self.requested.append(trade_date)
+        return pd.DataFrame({'ts_code': ['A', 'B'], 'trade_date': [trade_date] * 2,
+                             'close': [11.0, 10.5], 'high': [11.0, 10.8], 'low': [10.0, 10.0],
+                             'change': [1.0, 0.5]})
+
+    def stk_limit(self, trade_date):
+        if trade_date in self.unpublished:
+            return pd.DataFrame()
+        return pd.DataFrame({'ts_code': ['A', 'B'], 'trade_date': [trade_date] * 2,
+                             'up_limit': [11.0, 11.0], 'down_limit': [9.0, 9.0]})
+
+
+def test_update_only_fetches_missing_dates(tmp_path):
+    dates = ['20250303', '20250304', '20250305']
+    pro = FakePro()
+    assert LimitStatusStore(pro=pro, store_dir=str(tmp_path)).update(dates[:2]) == dates[:2]
+
+    # 重新运行时只请求新增的交易日
+    pro = FakePro()
+    store = LimitStatusStore(pro=pro, store_dir=str(tmp_path))
+    assert store.update(dates) == ['20250305']
+    assert pro.requested == ['20250305']
+
+    matrix, available = store.status_matrix(dates, ['A', 'B', 'C'])
+    assert available == dates
+    assert matrix[:, -1].tolist() == [UP_LIMIT, NO_LIMIT, NOT_TRADED]
+
+
+def test_day_without_limit_prices_is_not_stored(tmp_path):
+    pro = FakePro(unpublished={'20250304'})
+    store = LimitStatusStore(pro=pro, store_dir=str(tmp_path))
+    assert store.update(['20250303', '20250304']) == ['20250303']
+    assert not store.has_date('20250304')
+
+    # 涨跌停价发布后重新运行会补上这一天
+    pro = FakePro()
+    store = LimitStatusStore(pro=pro, store_dir=str(tmp_path))
+    assert store.update(['20250303', '20250304']) == ['20250304']
+    assert store.load('20250304')['status'].tolist() == [UP_LIMIT, NO_LIMIT]
+
+
+def test_parallel_update_resumes_missing_dates(tmp_path):
+    dates = [f'202503{day:02d}' for day in range(3, 15)]
+    LimitStatusStore(pro=FakePro(), store_dir=str(tmp_path)).update(dates[::2])
+    pro = FakePro()
+    added = LimitStatusStore(pro=pro, store_dir=str(tmp_path)).update(dates, max_workers=4)
+    assert added == dates[1::2]
+    assert sorted(pro.requested) == dates[1::2]
@@ -0,0 +1,75 @@
+import json
+import datetime
+import llm_cache
+from llm_cache import LLMCache
+
+
+def test_key_is_stable_and_depends_on_inputs(tmp_path):
+    cache = LLMCache(cache_dir=str(tmp_path))
+    key = cache.make_key('history_info', '平安银行', '姓名|职务\n张三|董事长', 'qwen-plus', 500)
+    # 缓存键不包含日期，第二天同样的输入得到同样的键
+    assert key == LLMCache(cache_dir=str(tmp_path)).make_key('history_info', '平安银行', '姓名|职务\n张三|董事长',
+                                                              'qwen-plus', 500)
+    assert key != cache.make_key('history_info', '平安银行', '姓名|职务\n李四|董事长', 'qwen-plus', 500)
+    assert key != cache.make_key('shareholders_info', '平安银行', '姓名|职务\n张三|董事长', 'qwen-plus', 500)
+    assert key != cache.make_key('history_info', '平安银行', '姓名|职务\n张三|董事长', 'qwen-max', 500)
+    assert key != cache.make_key('history_info', '平安银行', '姓名|职务\n张三|董事长', 'qwen-plus', 800)
+
+
+def test_hit_until_expiry(tmp_path, monkeypatch):
+    cache = LLMCache(cache_dir=str(tmp_path))
+    key = cache.make_key('history_info', 'A', 'x', 'qwen-plus', 500)
+    assert cache.get(key) is None
+    cache.set(key, 'history_info', '<p>历史</p>')
+    assert cache.get(key) == '<p>历史</p>'
+
+    monkeypatch.setitem(llm_cache.SECTION_TTL, 'customer_sales_info', -1)
+    expired = cache.make_key('customer_sales_info', 'A', 'x', 'qwen-plus', 500)
+    cache.set(expired, 'customer_sales_info', '<p>客户</p>')
+    assert cache.get(expired) is None
+    assert cache.get_stats() == {'hits': 1, 'misses': 2}
+
+
+class FixedDatetime(datetime.datetime):
+    """固定当前时间为2026-10-17（三季报披露窗口内）"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 10, 17, 10)
+
+
+def test_report_sections_outlive_report_window(tmp_path, monkeypatch):
+    # 披露窗口内写入的股东结构和收入结构第二天仍然有效，新的报告期数据通过缓存键失效
+    monkeypatch.setattr(llm_cache.datetime, 'datetime', FixedDatetime)
+    cache = LLMCache(cache_dir=str(tmp_path))
+    for section in ('shareholders_info', 'income_structure_info'):
+        key = cache.make_key(section, 'A', '报告期|股东名称\n20260630|甲', 'qwen-plus', 500)
+        cache.set(key, section, '<p>内容</p>')
+        with open(tmp_path / f"{key}.json", encoding='utf-8') as f:
+            assert json.load(f)['expires_at'] == '2027-02-14T10:00:00'
+        assert cache.get(key) == '<p>内容</p>'
+        newer = cache.make_key(section, 'A', '报告期|股东名称\n20260930|甲', 'qwen-plus', 500)
+        assert newer != key and cache.get(newer) is None
+
+
+def test_malformed_entries_are_misses(tmp_path):
+    cache = LLMCache(cache_dir=str(tmp_path))
+    entries = {
+        'no_content': {'section': 'history_info', 'expires_at': '2999-01-01T00:00:00'},
+        'not_a_dict': ['content'],
+        'bad_date': {'expires_at': 'soon', 'content': '<p>内容</p>'},
+    }
+    for key, entry in entries.items():
+        with open(tmp_path / f"{key}.json", 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        assert cache.get(key) is None
+    (tmp_path / 'truncated.json').write_text('{"expires_at": "2999-01-01T00:00:00", "con', encoding='utf-8')
+    assert cache.get('truncated') is None
+    assert cache.get_stats() == {'hits': 0, 'misses': 4}
+
+
+def test_sections_without_policy_are_not_cached(tmp_path):
+    cache = LLMCache(cache_dir=str(tmp_path))
+    key = cache.make_key('unknown', 'A', 'x', 'qwen-plus', 500)
+    cache.set(key, 'unknown', '<p>内容</p>')
+    assert cache.get(key) is None
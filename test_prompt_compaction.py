@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import prompt_compaction
+from prompt_compaction import (compact_table, compact_main_business, compact_management, compact_holders,
+                               estimate_tokens, RESUME_MAX_CHARS)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('营业收入') == 4
+    assert estimate_tokens('abcdefgh') == 2
+    assert estimate_tokens('收入abcd') == 3
+
+
+def test_compact_table_formats_and_dedups():
+    df = pd.DataFrame({'a': [1.0, 1.0, 2.345, np.nan], 'b': ['x|y', 'x|y', 'z\nw', None], 'c': [0, 0, 1, 2]})
+    table = compact_table(df, {'a': 'A', 'b': 'B', 'missing': 'M'})
+    assert table.split('\n') == ['A|B', '1|x/y', '2.35|z w', '|']
+
+
+def test_compact_table_trims_to_budget():
+    df = pd.DataFrame({'名称': [f'项目{i}' for i in range(20)], '数值': range(20)})
+    full = compact_table(df)
+    assert len(full.split('\n')) == 21
+    trimmed = compact_table(df, token_budget=30)
+    lines = trimmed.split('\n')
+    assert 1 < len(lines) < 21
+    assert estimate_tokens(trimmed) <= 30
+    # 从末尾删行，保留靠前的记录
+    assert lines[1:] == full.split('\n')[1:len(lines)]
+
+
+def test_compact_table_keeps_at_least_one_row():
+    df = pd.DataFrame({'名称': ['很长的名称' * 20, '第二行']})
+    lines = compact_table(df, token_budget=5).split('\n')
+    assert lines == ['名称', '很长的名称' * 20]
+
+
+def test_compact_table_empty():
+    assert compact_table(pd.DataFrame()) == ''
+    assert compact_table(None) == ''
+
+
+def test_compact_main_business_selects_recent_periods_and_top_items(monkeypatch):
+    monkeypatch.setattr(prompt_compaction, 'MAIN_BZ_PERIODS', 2)
+    monkeypatch.setattr(prompt_compaction, 'MAIN_BZ_ITEMS_PER_PERIOD', 2)
+    df = pd.DataFrame({
+        '报告期': ['20231231'] * 3 + ['20240630'] * 3 + ['20241231'] * 3,
+        '业务项目': ['甲', '乙', '丙'] * 3,
+        '业务收入': [1.0, 2.0, 3.0, 5.0, 4.0, 6.0, 9.0, 7.0, 8.0],
+        '收入占比': [10.0] * 9,
+        '业务利润': [0.1] * 9,
+    })
+    lines = compact_main_business(df).split('\n')
+    assert lines[0] == '报告期|业务项目|业务收入(亿元)|收入占比(%)'
+    assert lines[1:] == ['20241231|甲|9|10', '20241231|丙|8|10', '20240630|丙|6|10', '20240630|甲|5|10']
+
+
+def test_compact_holders_keeps_latest_periods_by_ratio():
+    df = pd.DataFrame({
+        'ts_code': ['A'] * 6,
+        'end_date': ['20240930', '20240930', '20241231', '20241231', '20250331', '20250331'],
+        'holder_name': ['甲', '乙', '甲', '乙', '甲', '乙'],
+        'hold_ratio': [10.0, 20.0, 11.0, 19.0, 12.5, 18.25],
+        'hold_change': [0.0, 0.0, 1000.0, -1000.0, 2000.0, np.nan],
+        'holder_type': ['自然人', '公司'] * 3,
+    })
+    lines = compact_holders(df).split('\n')
+    assert lines[0] == '报告期|股东名称|持股比例(%)|持股变动(股)|股东类型'
+    assert lines[1:] == ['20250331|乙|18.25||公司', '20250331|甲|12.5|2000|自然人',
+                         '20241231|乙|19|-1000|公司', '20241231|甲|11|1000|自然人']
+
+
+def test_compact_management_keeps_current_and_merges_titles():
+    df = pd.DataFrame({
+        'name': ['张三', '张三', '李四', '王五'],
+        'title': ['董事长', '总经理', '财务总监', '董事'],
+        'edu': ['硕士', '硕士', '本科', '博士'],
+        'birthday': ['1970', '1970', '1980', '1960'],
+        'begin_date': ['20200101', '20210101', '20190101', '20100101'],
+        'end_date': [None, None, None, '20180101'],
+        'resume': ['简历' * 100, '简历' * 100, '李四\n的简历', '已离任'],
+    })
+    lines = compact_management(df).split('\n')
+    assert lines[0] == '姓名|职务|学历|出生日期|任职起始|简历'
+    assert len(lines) == 3
+    name, title, edu, birthday, begin_date, resume = lines[1].split('|')
+    assert (name, title, begin_date) == ('张三', '董事长、总经理', '20200101')
+    assert resume == ('简历' * 100)[:RESUME_MAX_CHARS] + '…'
+    assert lines[2] == '李四|财务总监|本科|1980|20190101|李四 的简历'
+    assert '王五' not in '\n'.join(lines)
+
+
+def test_compact_management_falls_back_to_all_when_nobody_current():
+    df = pd.DataFrame({'name': ['王五'], 'title': ['董事'], 'end_date': ['20180101'], 'resume': [None]})
+    assert compact_management(df).split('\n')[1] == '王五|董事|'
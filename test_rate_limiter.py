@@ -0,0 +1,26 @@
+import rate_limiter
+from rate_limiter import TokenBucket
+
+
+def test_default_burst_is_small(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(200)
+    waits = [bucket.reserve() for _ in range(25)]
+    # 只有桶内的20个令牌可以立即使用，之后按每分钟200次排队
+    assert waits[:20] == [0.0] * 20
+    assert waits[20] > 0
+
+
+def test_first_minute_stays_near_rate(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(200)
+    sent = 0
+    while True:
+        wait = bucket.reserve()
+        if wait >= 60:
+            break
+        sent += 1
+    assert sent <= 200 + bucket.capacity
+    assert bucket.capacity == 20
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+from trade_calendar import TradeCalendar
+
+
+class FakePro:
+    """按工作日生成交易日历的假接口，跳过元旦"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def trade_cal(self, exchange, start_date, end_date, is_open):
+        self.calls += 1
+        days = pd.bdate_range(start_date, end_date)
+        days = [d.strftime('%Y%m%d') for d in days if d.strftime('%m%d') != '0101']
+        return pd.DataFrame({'cal_date': days})
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    return TradeCalendar(pro=FakePro(), calendar_dir=str(tmp_path))
+
+
+def test_previous_sessions_skips_weekends(calendar):
+    # 2025-03-10是周一
+    assert calendar.previous_sessions(3, '20250310') == ['20250306', '20250307', '20250310']
+    # 周日截止时从上周五开始往前数
+    assert calendar.previous_sessions(2, '20250309') == ['20250306', '20250307']
+
+
+def test_previous_sessions_crosses_year(calendar):
+    # 2025-01-01休市，2025-01-02是当年第一个交易日
+    assert calendar.previous_sessions(3, '20250102') == ['20241230', '20241231', '20250102']
+
+
+def test_shift(calendar):
+    assert calendar.shift('20250307', 1) == '20250310'
+    assert calendar.shift('20250308', 1) == '20250310'  # 周六先回到周五再向后移动
+    assert calendar.shift('20250310', -1) == '20250307'
+    assert calendar.shift('20250310', 0) == '20250310'
+    assert calendar.shift('20241231', 1) == '20250102'
+    assert calendar.shift('20250102', -1) == '20241231'
+
+
+def test_latest_trade_date_and_is_trade_date(calendar):
+    assert calendar.latest_trade_date('20250309') == '20250307'
+    assert calendar.is_trade_date('20250307')
+    assert not calendar.is_trade_date('20250101')
+
+
+def test_years_are_saved_locally(tmp_path):
+    pro = FakePro()
+    TradeCalendar(pro=pro, calendar_dir=str(tmp_path)).previous_sessions(5, '20230315')
+    calls = pro.calls
+    TradeCalendar(pro=pro, calendar_dir=str(tmp_path)).previous_sessions(5, '20230315')
+    assert pro.calls == calls
@@ -0,0 +1,88 @@
+import datetime
+import pandas as pd
+from tushare_cache import TushareCache, CachedProApi, compute_expiry
+
+
+class FakePro:
+    """记录调用次数的假接口，按公告日期区间返回数据"""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def query(self, api_name, fields='', **kwargs):
+        self.calls += 1
+        dates = self.data['ann_date']
+        return self.data[(dates >= kwargs['start_date']) & (dates <= kwargs['end_date'])].copy()
+
+
+INCOME = pd.DataFrame({
+    'ts_code': ['000001.SZ'] * 4,
+    'ann_date': ['20200425', '20210430', '20220428', '20230420'],
+    'end_date': ['20191231', '20201231', '20211231', '20221231'],
+    'revenue': [1.0, 2.0, 3.0, 4.0],
+})
+
+
+def test_report_period_key_ignores_moving_window(tmp_path):
+    pro = FakePro(INCOME)
+    api = CachedProApi(pro, cache=TushareCache(cache_dir=str(tmp_path)))
+
+    first = api.income(ts_code='000001.SZ', start_date='20200101', end_date='20240101')
+    # 第二天重新分析同一只股票，查询区间整体后移一天
+    second = api.income(ts_code='000001.SZ', start_date='20200102', end_date='20240102')
+
+    assert pro.calls == 1
+    assert list(second['ann_date']) == list(first['ann_date'])
+    assert api.cache.get_stats()['income'] == {'hits': 1, 'misses': 1}
+
+
+def test_report_period_cache_filters_to_requested_window(tmp_path):
+    pro = FakePro(INCOME)
+    api = CachedProApi(pro, cache=TushareCache(cache_dir=str(tmp_path)))
+
+    api.income(ts_code='000001.SZ', start_date='20200101', end_date='20240101')
+    narrower = api.income(ts_code='000001.SZ', start_date='20210101', end_date='20221231')
+
+    assert pro.calls == 1
+    assert list(narrower['ann_date']) == ['20210430', '20220428']
+
+
+def test_report_period_cache_misses_when_window_starts_earlier(tmp_path):
+    pro = FakePro(INCOME)
+    api = CachedProApi(pro, cache=TushareCache(cache_dir=str(tmp_path)))
+
+    api.income(ts_code='000001.SZ', start_date='20210101', end_date='20240101')
+    wider = api.income(ts_code='000001.SZ', start_date='20200101', end_date='20240101')
+
+    assert pro.calls == 2
+    assert len(wider) == 4
+
+
+def test_other_params_still_part_of_key(tmp_path):
+    cache = TushareCache(cache_dir=str(tmp_path))
+    window = {'start_date': '20200101', 'end_date': '20240101'}
+    assert cache.make_key('income', {'ts_code': 'A', **window}) == \
+        cache.make_key('income', {'ts_code': 'A', 'start_date': '20200102', 'end_date': '20240102'})
+    assert cache.make_key('income', {'ts_code': 'A', **window}) != cache.make_key('income', {'ts_code': 'B', **window})
+    # 行情类接口的日期参数仍然计入缓存键
+    assert cache.make_key('daily_basic', {'ts_code': 'A', **window}) != \
+        cache.make_key('daily_basic', {'ts_code': 'A', 'start_date': '20200102', 'end_date': '20240102'})
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = TushareCache(cache_dir=str(tmp_path), ttl={'stock_company': -1})
+    cache.set('stock_company', {'ts_code': 'A'}, pd.DataFrame({'ts_code': ['A']}))
+    assert cache.get('stock_company', {'ts_code': 'A'}) is None
+
+    cache = TushareCache(cache_dir=str(tmp_path), ttl={'stock_company': 3600})
+    cache.set('stock_company', {'ts_code': 'A'}, pd.DataFrame({'ts_code': ['A']}))
+    assert cache.get('stock_company', {'ts_code': 'A'}) is not None
+
+
+def test_report_period_expiry():
+    # 披露窗口内缓存到当天结束，窗口外缓存到下一个披露窗口开始
+    in_window = datetime.datetime(2025, 4, 15, 10)
+    assert compute_expiry('report_period', {}, None, now=in_window) == datetime.datetime(2025, 4, 16)
+    out_of_window = datetime.datetime(2025, 5, 20, 10)
+    assert compute_expiry('report_period', {}, None, now=out_of_window) == datetime.datetime(2025, 7, 1)
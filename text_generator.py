@@ -1,17 +1,74 @@
 import os
 import json
 import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
 from http import HTTPStatus
 import dashscope  # Alibaba Cloud Qwen SDK
 import markdown
+from rate_limiter import TokenBucket
+from llm_cache import get_default_llm_cache
+from llm_metrics import get_default_llm_metrics
+from prompt_compaction import compact_main_business, compact_management, compact_holders
+
+
+# 旧版SDK没有异步接口时，阻塞调用放到线程池中执行的线程数，可以通过环境变量LLM_THREAD_WORKERS修改
+LLM_THREAD_WORKERS = int(os.environ.get('LLM_THREAD_WORKERS', 8))
+
+# 同一个事件循环中同时进行的请求数上限，批量生成时对所有股票的所有章节生效，可以通过环境变量LLM_MAX_IN_FLIGHT修改
+LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 16))
+
+# 各模型每分钟请求数上限，未列出的模型不限速；可以通过环境变量LLM_MODEL_RPM修改，格式为JSON，例如{"qwen-plus": 120}
+LLM_MODEL_RPM = {'qwen-plus': 120}
+LLM_MODEL_RPM.update(json.loads(os.environ.get('LLM_MODEL_RPM', '{}')))
+
+_llm_executor = None
+_llm_executor_lock = threading.Lock()
+
+_model_limiters = {}
+_model_limiters_lock = threading.Lock()
+
+
+def get_model_rate_limiter(model):
+    """获取某个模型在进程内共享的令牌桶，没有配置限速的模型返回None"""
+    with _model_limiters_lock:
+        if model not in _model_limiters:
+            rpm = LLM_MODEL_RPM.get(model)
+            _model_limiters[model] = TokenBucket(rpm) if rpm else None
+        return _model_limiters[model]
+
+
+def _get_llm_executor():
+    """获取进程内共享的有界线程池"""
+    global _llm_executor
+    with _llm_executor_lock:
+        if _llm_executor is None:
+            _llm_executor = ThreadPoolExecutor(max_workers=LLM_THREAD_WORKERS, thread_name_prefix='llm')
+        return _llm_executor
+
+
+async def _qwen_generation_call(**kwargs):
+    """
+    异步调用Qwen生成接口，不阻塞事件循环，多个章节的请求可以同时进行
+    优先使用SDK自带的AioGeneration；旧版SDK没有时把阻塞的Generation.call放到有界线程池中执行
+    """
+    if hasattr(dashscope, 'AioGeneration'):
+        return await dashscope.AioGeneration.call(**kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_llm_executor(), functools.partial(dashscope.Generation.call, **kwargs))
 
 
 class TextGenerator:
-    def __init__(self, words_limit: int = 500):
+    def __init__(self, words_limit: int = 500, max_in_flight: int = LLM_MAX_IN_FLIGHT, llm_cache=None,
+                 llm_metrics=None):
         """
         初始化文本生成器
         从环境变量中获取阿里云API密钥
+        max_in_flight: 同时进行的请求数上限
+        llm_cache: 生成结果缓存，默认使用进程内共享的缓存
+        llm_metrics: 调用指标记录，默认使用进程内共享的记录
         """
         # 从环境变量获取阿里云API KEY
         api_key = os.environ.get('DASHSCOPE_API_KEY')
@@ -20,50 +77,31 @@ class TextGenerator:
 
         dashscope.api_key = api_key
         self.words_limit = words_limit
+        self.max_in_flight = max_in_flight
+        self.llm_cache = llm_cache or get_default_llm_cache()
+        self.llm_metrics = llm_metrics or get_default_llm_metrics()
+        self._in_flight = None
+        self._in_flight_loop = None
         print(f"成功初始化阿里云Qwen API客户端，字数限制: {words_limit}")
 
     async def generate_income_structure_info(self, company_name: str, financial_data: Optional[Dict] = None) -> str:
         """
         生成公司收入结构和主要收入贡献来源的信息
         """
-        # 只提取主营业务构成数据，避免传递过多无关信息
+        # 只提取主营业务构成数据，压缩为最近几个报告期的紧凑表格，避免传递过多无关信息
         main_bz_data = "无主营业务构成数据"
         if financial_data and isinstance(financial_data, dict):
             # 从financial_data中提取main_business_composition部分
             main_bz_composition = financial_data.get('main_business_composition', None)
             if main_bz_composition is not None and hasattr(main_bz_composition, 'to_dict'):
-                # 如果是DataFrame，转换为适合输出的格式
                 try:
-                    # 取主要的收入结构相关字段，包括报告期
-                    required_cols = ['报告期', '业务项目', '业务收入', '收入占比']
-                    if not main_bz_composition.empty and all(col in main_bz_composition.columns for col in required_cols):
-                        # 只取关键字段并转换为字典
-                        selected_data = main_bz_composition[required_cols].dropna()
-                        if not selected_data.empty:
-                            simplified_records = selected_data.to_dict('records')
-                            main_bz_data = json.dumps({
-                                'main_business_composition': simplified_records
-                            }, ensure_ascii=False, indent=2)
-                        else:
-                            main_bz_data = "无主营业务构成数据"
-                    else:
-                        # 如果DataFrame没有预期的列，尝试包含报告期在内的所有可用列
-                        if '报告期' in main_bz_composition.columns:
-                            # 至少包含报告期和业务项目
-                            available_cols = ['报告期', '业务项目']
-                            for col in ['业务收入', '收入占比', '业务利润', '毛利率']:
-                                if col in main_bz_composition.columns:
-                                    available_cols.append(col)
-                            selected_data = main_bz_composition[available_cols]
-                            main_bz_data = json.dumps(selected_data.to_dict('records'), ensure_ascii=False, indent=2)
-                        else:
-                            # 如果没有报告期列，直接转换整个DataFrame
-                            main_bz_data = json.dumps(main_bz_composition.to_dict('records'), ensure_ascii=False, indent=2)
+                    if not main_bz_composition.empty:
+                        main_bz_data = compact_main_business(main_bz_composition)
                 except Exception as e:
                     main_bz_data = f"主营业务构成数据处理错误: {str(e)}"
             elif main_bz_composition is not None:
                 # 如果不是DataFrame，直接使用
-                main_bz_data = json.dumps(main_bz_composition, ensure_ascii=False, indent=2)
+                main_bz_data = json.dumps(main_bz_composition, ensure_ascii=False, separators=(',', ':'))
         
         prompt = f"""
         请联网搜索并分析{company_name}的收入结构和主要收入贡献来源。基于以下主营业务构成数据：
@@ -82,36 +120,20 @@ class TextGenerator:
         字数控制在{self.words_limit+500}字以内
         """
 
-        return await self._call_qwen_api_async(prompt)
+        return await self._cached_call('income_structure_info', company_name, main_bz_data, prompt)
 
     async def generate_history_and_founder_info(self, company_name: str, management_info=None) -> str:
         """
         生成公司发展历史沿革和创始人背景信息
         """
-        # 整理管理层信息，用于提供给模型
+        # 整理管理层信息，用于提供给模型：在任人员、合并职务、截断简历
         management_details = ""
         if management_info is not None:
             # 检查是否为DataFrame类型
             if hasattr(management_info, 'to_dict'):
-                # 如果是DataFrame，转换为字典格式
                 try:
-                    # 取前10条记录以避免上下文过长
-                    records = management_info.head(10).to_dict('records')
-                    management_details = "当前管理层信息：\n"
-                    for record in records:
-                        name = record.get('name', '未知')
-                        gender = record.get('gender', '未知')
-                        lev = record.get('lev', '未知')  # 职务级别
-                        title = record.get('title', '未知')  # 职位名称
-                        edu = record.get('edu', '未知')  # 学历
-                        national = record.get('national', '未知')  # 国籍
-                        birthday = record.get('birthday', '未知')  # 生日
-                        begin_date = record.get('begin_date', '未知')  # 任职开始日期
-                        end_date = record.get('end_date', '未知')  # 任职结束日期
-                        resume = record.get('resume', '无详细简历')  # 简历
-                        
-                        management_details += f"- {name} ({title})，性别：{gender}，级别：{lev}，学历：{edu}，国籍：{national}，生日：{birthday}，任职期间：{begin_date}至{end_date}，简历：{resume}\n"
-                except:
+                    management_details = "当前管理层信息：\n" + compact_management(management_info)
+                except Exception:
                     management_details = "当前管理层信息：无法解析的管理层数据"
             else:
                 management_details = "当前管理层信息：非DataFrame格式数据"
@@ -130,7 +152,7 @@ class TextGenerator:
         字数不超过{self.words_limit}字
         """
 
-        return await self._call_qwen_api_async(prompt)
+        return await self._cached_call('history_info', company_name, management_details, prompt)
 
     async def generate_customer_and_sales_info(self, company_name: str, industry_info: Optional[str] = None) -> str:
         """
@@ -150,7 +172,7 @@ class TextGenerator:
         字数控制在{self.words_limit}字以内
         """
 
-        return await self._call_qwen_api_async(prompt)
+        return await self._cached_call('customer_sales_info', company_name, industry_info, prompt)
 
     async def generate_shareholders_info(self, company_name: str, stock_code: str, top10_holders_data=None) -> str:
         """
@@ -161,20 +183,13 @@ class TextGenerator:
             # 检查是否为DataFrame类型
             if hasattr(top10_holders_data, 'to_dict'):
                 try:
-                    # 转换为字典格式，只取关键字段
-                    required_cols = ['end_date', 'holder_name', 'hold_ratio', 'hold_change', 'holder_type']
-                    available_cols = [col for col in required_cols if col in top10_holders_data.columns]
-                    selected_data = top10_holders_data[available_cols].copy()
-                    
-                    # 只取非空数据
-                    if not selected_data.empty:
-                        holders_info = json.dumps(selected_data.to_dict('records'), ensure_ascii=False, indent=2)
-                    else:
-                        holders_info = "无前十大股东数据"
+                    # 只取最近两个报告期的关键字段，压缩为紧凑表格
+                    if not top10_holders_data.empty:
+                        holders_info = compact_holders(top10_holders_data)
                 except Exception as e:
                     holders_info = f"前十大股东数据处理错误: {str(e)}"
             else:
-                holders_info = json.dumps(top10_holders_data, ensure_ascii=False, indent=2)
+                holders_info = json.dumps(top10_holders_data, ensure_ascii=False, separators=(',', ':'))
         prompt = f"""
         请基于{company_name}（股票代码：{stock_code}）的前十大股东数据，详细介绍该公司的股东结构：
 
@@ -192,43 +207,98 @@ class TextGenerator:
         字数控制在{self.words_limit}字以内
         """
 
-        return await self._call_qwen_api_async(prompt)
+        return await self._cached_call('shareholders_info', company_name, [stock_code, holders_info], prompt)
 
-    async def _call_qwen_api_async(self, prompt: str, model: str = "qwen-plus") -> str:
+    async def _cached_call(self, section: str, company_name: str, inputs, prompt: str, model: str = "qwen-plus") -> str:
+        """
+        带缓存的章节生成：相同章节、公司、结构化输入、模型和字数限制的结果在有效期内直接复用
+        """
+        cache_key = self.llm_cache.make_key(section, company_name, inputs, model, self.words_limit)
+        content = self.llm_cache.get(cache_key)
+        if content is not None:
+            print(f"{company_name} 的 {section} 命中缓存")
+            return content
+        return await self._call_qwen_api_async(prompt, model, cache_key=cache_key, section=section,
+                                              company_name=company_name)
+
+    async def _call_qwen_api_async(self, prompt: str, model: str = "qwen-plus",
+                                   cache_key: Optional[str] = None, section: Optional[str] = None,
+                                   company_name: Optional[str] = None) -> str:
         """
         调用阿里云Qwen API生成文本
+        传入cache_key时，成功生成的结果按section的缓存策略写入缓存；调用失败的结果不缓存
+        每次调用的token用量、耗时和错误记录到llm_metrics
         """
         # 大约每个汉字需要2-3个token，所以将字数乘以3以确保足够
         max_tokens = max(500, int(self.words_limit * 3))
 
-        try:
-            response = dashscope.Generation.call(
-                model=model,
-                prompt=prompt,
-                result_format='message',  # 设置返回格式为message
-                max_tokens=max_tokens,  # 限制最大token数
-                enable_search=True,  # 启用联网搜索功能
-                temperature=0.75,  # 控制生成的随机性
-            )
+        # 限制同时进行的请求数，并按模型的每分钟请求数限速
+        async with self._in_flight_limit():
+            limiter = get_model_rate_limiter(model)
+            if limiter is not None:
+                wait = limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            try:
+                # 记录token用量、耗时和错误，非流式调用的首个token时间即收到完整响应的时间
+                with self.llm_metrics.track('qwen', model, section, company_name) as call:
+                    response = await _qwen_generation_call(
+                        model=model,
+                        prompt=prompt,
+                        result_format='message',  # 设置返回格式为message
+                        max_tokens=max_tokens,  # 限制最大token数
+                        enable_search=True,  # 启用联网搜索功能
+                        temperature=0.75,  # 控制生成的随机性
+                    )
+                    call.mark_first_token()
+                    usage = getattr(response, 'usage', None)
+                    if usage:
+                        call.set_usage(usage.get('input_tokens'), usage.get('output_tokens'))
+                    if response.status_code != HTTPStatus.OK:
+                        call.error = f"状态码 {response.status_code}: {response.message}"
+                    elif not (hasattr(response, 'output') and 'choices' in response.output):
+                        call.error = "API响应格式异常"
             
-            if response.status_code == HTTPStatus.OK:
-                # 提取生成的文本内容
-                if hasattr(response, 'output') and 'choices' in response.output:
-                    content = response.output['choices'][0]['message']['content']
-                    # 将markdown格式转换为HTML格式，以便在HTML中正确显示
-                    html_content = markdown.markdown(content, extensions=['extra', 'codehilite', 'toc', 'tables', 'fenced_code'])
-                    return html_content
+                if response.status_code == HTTPStatus.OK:
+                    # 提取生成的文本内容
+                    if hasattr(response, 'output') and 'choices' in response.output:
+                        content = response.output['choices'][0]['message']['content']
+                        # 将markdown格式转换为HTML格式，以便在HTML中正确显示
+                        html_content = markdown.markdown(content, extensions=['extra', 'codehilite', 'toc', 'tables', 'fenced_code'])
+                        if cache_key is not None:
+                            try:
+                                self.llm_cache.set(cache_key, section, html_content)
+                            except OSError as e:
+                                print(f"生成结果写入缓存失败: {e}")
+                        return html_content
+                    else:
+                        print(f"API响应格式异常: {response}")
+                        return f"API响应格式异常: {response}"
                 else:
-                    print(f"API响应格式异常: {response}")
-                    return f"API响应格式异常: {response}"
-            else:
-                print(f"API调用失败，状态码: {response.status_code}, 错误信息: {response.message}")
-                return f"API调用失败: {response.message}"
+                    print(f"API调用失败，状态码: {response.status_code}, 错误信息: {response.message}")
+                    return f"API调用失败: {response.message}"
                 
-        except Exception as e:
-            print(f"调用Qwen API时发生错误: {e}")
-            return f"API调用错误: {e}"
+            except Exception as e:
+                print(f"调用Qwen API时发生错误: {e}")
+                return f"API调用错误: {e}"
 
+    async def run_blocking_call(self, func, *args, **kwargs):
+        """
+        在共享的请求数限制下执行阻塞的大模型调用（如豆包异动分析），放到有界线程池中执行，不阻塞事件循环
+        批量生成报告时与Qwen的章节请求一起调度
+        """
+        async with self._in_flight_limit():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_llm_executor(), functools.partial(func, *args, **kwargs))
+
+    def _in_flight_limit(self):
+        """当前事件循环中限制同时进行的请求数的信号量，每个事件循环单独创建"""
+        loop = asyncio.get_running_loop()
+        if self._in_flight_loop is not loop:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._in_flight_loop = loop
+        return self._in_flight
 
     def generate_all_company_info(self, company_name: str, stock_code: str,
                                 financial_data: Optional[Dict] = None,
@@ -238,16 +308,16 @@ class TextGenerator:
         生成所有公司信息（同步接口，内部使用异步处理）
         """
         print(f"开始为公司 {company_name} (股票代码: {stock_code}) 生成文本信息...")
-        return asyncio.run(self._generate_all_company_info_async(
+        return asyncio.run(self.generate_all_company_info_async(
             company_name, stock_code, financial_data, industry_info, management_info
         ))
 
-    async def _generate_all_company_info_async(self, company_name: str, stock_code: str, 
-                                             financial_data: Optional[Dict] = None, 
-                                             industry_info: Optional[str] = None, 
-                                             management_info: Optional[Dict] = None) -> Dict[str, str]: 
+    async def generate_all_company_info_async(self, company_name: str, stock_code: str, 
+                                            financial_data: Optional[Dict] = None, 
+                                            industry_info: Optional[str] = None, 
+                                            management_info: Optional[Dict] = None) -> Dict[str, str]: 
         """ 
-        异步生成所有公司信息（内部使用） 
+        异步生成所有公司信息，批量生成报告时在调用方的事件循环中与其他股票一起调度 
         """ 
         print(f"开始异步生成公司 {company_name} (股票代码: {stock_code}) 的文本信息...") 
 
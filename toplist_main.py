@@ -6,77 +6,131 @@
 """
 
 import os
-import tushare as ts
 import pandas as pd
 from datetime import datetime
 from datetime import timedelta
 import time
 import sys
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from data_extractor import DataExtractor
 from text_generator import TextGenerator
-from content_integration import ContentIntegrator
+from content_integration import ContentIntegrator, KLINE_MODE
 from doubao_websearch import get_stock_abnormal_info
+from tushare_client import get_pro_api
+from trade_calendar import get_trade_calendar
+from chart_farm import ChartRenderFarm
+
+# 一批股票数量达到该值时启用全市场财务快照，避免逐只股票请求财报接口
+BULK_MODE_MIN_STOCKS = 20
+# 单只股票数据提取的并发线程数
+EXTRACT_WORKERS = 4
+# 批量生成报告时同时处理的股票数，可以通过环境变量BATCH_MAX_STOCKS修改
+BATCH_MAX_STOCKS = int(os.environ.get('BATCH_MAX_STOCKS', 8))
+
+def get_abnormal_info(company_name, stock_code, minus_days=0):
+    """报告生成的第1步：获取股票异动信息，未获取到时返回提示文字"""
+    print(f"步骤1: 获取 {company_name}({stock_code}) 的异动信息...")
+    # 使用对应的交易日作为查询日期（非交易日时取之前最近的交易日）
+    trade_date = get_trade_calendar().latest_trade_date(datetime.now() - timedelta(days=minus_days))
+    current_date = datetime.strptime(trade_date, '%Y%m%d').strftime('%Y年%m月%d日')
+    abnormal_info = get_stock_abnormal_info(stock_code, company_name, current_date)
+    if abnormal_info:
+        print(f"获取到异动信息成功")
+    else:
+        print(f"未能获取到异动信息，跳过此步骤")
+        abnormal_info = "暂未获取到相关异动信息。"
+    return abnormal_info
+
+
+def extract_company_data(company_name, stock_code, bulk_mode=False):
+    """
+    报告生成的第2步：提取公司数据，并整理文本生成所需的输入
+    返回(data_extractor_result, text_inputs)
+    """
+    print(f"步骤2: 提取 {company_name}({stock_code}) 的公司数据...")
+    data_extractor = DataExtractor(bulk_mode=bulk_mode, max_workers=EXTRACT_WORKERS)
+    data_extractor_result = data_extractor.get_all_data(stock_code)
+
+    # Extract financial data for better text generation
+    financial_data = {
+        'annual_revenue': data_extractor_result.get('annual_revenue', pd.DataFrame()).to_dict() if not data_extractor_result.get('annual_revenue', pd.DataFrame()).empty else {},
+        'main_business_composition': data_extractor_result.get('main_business_composition', pd.DataFrame()),  # 传递DataFrame而不是字典，便于处理
+        'top10_holders': data_extractor_result.get('top10_holders', pd.DataFrame())  # 传递前十大股东数据
+    }
+
+    # Extract management information
+    management_info = data_extractor_result.get('management_info', None)
+
+    text_inputs = {
+        'company_name': company_name,
+        'stock_code': stock_code,
+        'financial_data': financial_data,
+        'management_info': management_info
+    }
+    return data_extractor_result, text_inputs
+
+
+def prepare_analysis(company_name, stock_code, minus_days=0, bulk_mode=False):
+    """
+    报告生成的前两步：获取异动信息、提取公司数据，并整理文本生成所需的输入
+    返回包含abnormal_info、data_extractor_result和text_inputs的字典
+    """
+    abnormal_info = get_abnormal_info(company_name, stock_code, minus_days=minus_days)
+    data_extractor_result, text_inputs = extract_company_data(company_name, stock_code, bulk_mode=bulk_mode)
+    return {
+        'abnormal_info': abnormal_info,
+        'data_extractor_result': data_extractor_result,
+        'text_inputs': text_inputs,
+    }
+
 
-def run_analysis(company_name, stock_code, output_dir, index=None, minus_days=0):
+def write_report(company_name, stock_code, output_dir, prepared, text_generator_result, index=None, chart_farm=None):
+    """
+    报告生成的第4步：整合内容并写入报告
+    text_generator_result: 文本生成结果或仍在生成中的Future
+    """
+    # 4. 整合内容 (使用ContentIntegrator)
+    print(f"步骤4: 整合 {company_name}({stock_code}) 的内容并生成报告...")
+    content_integrator = ContentIntegrator()
+    # 临时修改输出目录
+    content_integrator.output_dir = output_dir
+
+    report_path = content_integrator.integrate_content(
+        company_name=company_name,
+        stock_code=stock_code,
+        data_extractor_result=prepared['data_extractor_result'],
+        text_generator_result=text_generator_result,
+        abnormal_info=prepared['abnormal_info'],
+        index=index,
+        kline_future=chart_farm.get(stock_code) if chart_farm else None
+    )
+
+    print(f"\n{company_name}({stock_code}) 公司分析报告生成完成！")
+    print(f"报告位置: {report_path}")
+    return report_path
+
+
+def run_analysis(company_name, stock_code, output_dir, index=None, minus_days=0, bulk_mode=False, chart_farm=None):
     """
     执行数据分析和报告生成的函数
+    chart_farm: 批量运行时共享的K线图渲染进程池，K线图已提前提交时直接取回结果
     """
     try:
-        # 1. 获取股票异动信息
-        print(f"步骤1: 获取 {company_name}({stock_code}) 的异动信息...")
-        # 使用当前日期作为查询日期
-        current_date = (datetime.now() - timedelta(days=minus_days)).strftime('%Y年%m月%d日')
-        abnormal_info = get_stock_abnormal_info(stock_code, company_name, current_date)
-        if abnormal_info:
-            print(f"获取到异动信息成功")
-        else:
-            print(f"未能获取到异动信息，跳过此步骤")
-            abnormal_info = "暂未获取到相关异动信息。"
-
-        # 2. 提取数据 (使用DataExtractor)
-        print(f"步骤2: 提取 {company_name}({stock_code}) 的公司数据...")
-        data_extractor = DataExtractor()
-        data_extractor_result = data_extractor.get_all_data(stock_code)
+        prepared = prepare_analysis(company_name, stock_code, minus_days=minus_days, bulk_mode=bulk_mode)
 
         # 3. 生成文本信息 (使用TextGenerator)
         print(f"步骤3: 生成 {company_name}({stock_code}) 的文本信息...")
         text_generator = TextGenerator(words_limit=500)
 
-        # Extract financial data for better text generation
-        financial_data = {
-            'annual_revenue': data_extractor_result.get('annual_revenue', pd.DataFrame()).to_dict() if not data_extractor_result.get('annual_revenue', pd.DataFrame()).empty else {},
-            'main_business_composition': data_extractor_result.get('main_business_composition', pd.DataFrame()),  # 传递DataFrame而不是字典，便于处理
-            'top10_holders': data_extractor_result.get('top10_holders', pd.DataFrame())  # 传递前十大股东数据
-        }
-
-        # Extract management information
-        management_info = data_extractor_result.get('management_info', None)
-
-        text_generator_result = text_generator.generate_all_company_info(
-            company_name=company_name,
-            stock_code=stock_code,
-            financial_data=financial_data,
-            management_info=management_info
-        )
-
-        # 4. 整合内容 (使用ContentIntegrator)
-        print(f"步骤4: 整合 {company_name}({stock_code}) 的内容并生成报告...")
-        content_integrator = ContentIntegrator()
-        # 临时修改输出目录
-        original_output_dir = content_integrator.output_dir
-        content_integrator.output_dir = output_dir
-
-        report_path = content_integrator.integrate_content(
-            company_name=company_name,
-            stock_code=stock_code,
-            data_extractor_result=data_extractor_result,
-            text_generator_result=text_generator_result,
-            abnormal_info=abnormal_info,
-            index=index
-        )
-
-        print(f"\n{company_name}({stock_code}) 公司分析报告生成完成！")
-        print(f"报告位置: {report_path}")
+        # 文本生成在后台线程中进行，报告先写入不依赖文本的部分，写到需要文本的部分时再等待
+        with ThreadPoolExecutor(max_workers=1) as text_executor:
+            text_generator_result = text_executor.submit(text_generator.generate_all_company_info,
+                                                         **prepared['text_inputs'])
+            write_report(company_name, stock_code, output_dir, prepared, text_generator_result,
+                         index=index, chart_farm=chart_farm)
+        text_generator.llm_metrics.print_summary()
 
     except Exception as e:
         print(f"处理 {company_name}({stock_code}) 时发生错误: {e}")
@@ -84,18 +138,73 @@ def run_analysis(company_name, stock_code, output_dir, index=None, minus_days=0)
         traceback.print_exc()
 
 
+def run_batch_analysis(stocks, output_dir, minus_days=0, bulk_mode=False, chart_farm=None, label_map=None):
+    """
+    批量生成报告
+    stocks: (序号, 公司名称, 股票代码)列表
+    每只股票的完整流程（异动信息、数据提取、文本生成、写入报告）是同一个事件循环中的一个任务，
+    同时处理的股票数受BATCH_MAX_STOCKS限制；豆包异动分析和Qwen章节请求共用TextGenerator的请求数上限，
+    每只股票完成后立即写入报告，单只股票失败不影响其他股票
+    label_map: 股票代码到进度提示附加信息的映射（如连板状态）
+    """
+    if not stocks:
+        return
+
+    start_time = time.time()
+    text_generator = TextGenerator(words_limit=500)
+    print(f"开始批量处理 {len(stocks)} 只股票，同时处理的股票数上限: {BATCH_MAX_STOCKS}，"
+          f"同时进行的大模型请求数上限: {text_generator.max_in_flight}")
+    asyncio.run(_run_batch_analysis_async(stocks, output_dir, text_generator, minus_days=minus_days,
+                                          bulk_mode=bulk_mode, chart_farm=chart_farm, label_map=label_map))
+    print(f"批量处理完成，耗时: {time.time() - start_time:.2f} 秒")
+    text_generator.llm_cache.print_stats()
+    # 异动信息和文本生成的大模型调用汇总，可以看出哪个章节占用的时间最多
+    text_generator.llm_metrics.print_summary()
+
+
+async def _run_batch_analysis_async(stocks, output_dir, text_generator, minus_days=0, bulk_mode=False,
+                                    chart_farm=None, label_map=None):
+    """在一个事件循环中调度所有股票的报告生成流程"""
+    loop = asyncio.get_running_loop()
+    stock_limit = asyncio.Semaphore(BATCH_MAX_STOCKS)
+    total_stocks = len(stocks)
+
+    with ThreadPoolExecutor(max_workers=BATCH_MAX_STOCKS, thread_name_prefix='report') as executor:
+        async def run_one(index, company_name, stock_code):
+            async with stock_limit:
+                label = f" - {label_map[stock_code]}" if label_map and stock_code in label_map else ""
+                print(f"\n[{index}/{total_stocks}] 正在处理: {company_name}({stock_code}){label}")
+                try:
+                    # 异动信息和数据提取互不依赖，同时进行
+                    abnormal_info, (data_extractor_result, text_inputs) = await asyncio.gather(
+                        text_generator.run_blocking_call(get_abnormal_info, company_name, stock_code,
+                                                         minus_days=minus_days),
+                        loop.run_in_executor(executor, functools.partial(extract_company_data, company_name,
+                                                                         stock_code, bulk_mode=bulk_mode)),
+                    )
+                    text_generator_result = await text_generator.generate_all_company_info_async(**text_inputs)
+                    prepared = {
+                        'abnormal_info': abnormal_info,
+                        'data_extractor_result': data_extractor_result,
+                        'text_inputs': text_inputs,
+                    }
+                    await loop.run_in_executor(executor, functools.partial(
+                        write_report, company_name, stock_code, output_dir, prepared, text_generator_result,
+                        index=index, chart_farm=chart_farm))
+                except Exception as e:
+                    print(f"处理 {company_name}({stock_code}) 时发生错误: {e}")
+                    import traceback
+                    traceback.print_exc()
+
+        await asyncio.gather(*(run_one(*stock) for stock in stocks))
+
+
 def get_toplist_data(today):
     """
     通过Tushare的top_list接口获取当天的龙虎榜交易明细
     """
-    # 从环境变量获取Tushare token
-    token = os.environ.get('TUSHARE_TOKEN')
-    if not token:
-        raise ValueError("TUSHARE_TOKEN环境变量未设置")
-
-    # 设置token并初始化API
-    ts.set_token(token)
-    pro = ts.pro_api()
+    # 使用进程内共享的Tushare客户端
+    pro = get_pro_api()
 
     try:
         # 调用top_list接口获取当天龙虎榜数据
@@ -205,22 +314,21 @@ def generate_reports_for_toplist(df, date_str):
     os.makedirs(output_date_dir, exist_ok=True)
 
     start_time = time.time()
+    bulk_mode = total_stocks >= BULK_MODE_MIN_STOCKS
 
-    for index, row in df.iterrows():
-        current_stock = index + 1
-        stock_code = row['ts_code']
-        stock_name = row['name']
-        
-        print(f"\n[{current_stock}/{total_stocks}] 正在处理: {stock_name}({stock_code})")
-        
-        try:
-            run_analysis(stock_name, stock_code, output_date_dir, index=index+1)
-        except Exception as e:
-            print(f"处理 {stock_name}({stock_code}) 时发生错误: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
+    # 先把所有股票的K线图提交到渲染进程池，与后续的数据提取和文本生成并行执行
+    # 浏览器端绘制K线图时不需要渲染进程池
+    chart_farm = None
+    if KLINE_MODE == 'image':
+        chart_farm = ChartRenderFarm()
+        chart_farm.submit_all(zip(df['ts_code'], df['name']))
+
+    stocks = [(index + 1, row['name'], row['ts_code']) for index, row in df.iterrows()]
+    run_batch_analysis(stocks, output_date_dir, bulk_mode=bulk_mode, chart_farm=chart_farm)
 
+    if chart_farm:
+        chart_farm.shutdown()
+        chart_farm.chart_cache.print_stats()
     end_time = time.time()
     total_duration = end_time - start_time
     print("="*60)
@@ -228,6 +336,7 @@ def generate_reports_for_toplist(df, date_str):
     print(f"总共处理了 {total_stocks} 只股票")
     print(f"总耗时: {total_duration:.2f} 秒")
     print(f"平均每个股票耗时: {total_duration/total_stocks:.2f} 秒")
+    get_pro_api().print_stats()
 
 
 def main():
@@ -235,8 +344,8 @@ def main():
     主函数
     """
     minus_days = 0  # 设置为1表示获取昨天的龙虎榜数据
-    # 获取当天（或几天前的）日期字符串
-    today = (datetime.now() - timedelta(days=minus_days)).strftime('%Y%m%d')
+    # 获取当天（或几天前的）最近一个交易日
+    today = get_trade_calendar().latest_trade_date(datetime.now() - timedelta(days=minus_days))
 
     print(f"正在获取{today}的龙虎榜数据...")
 
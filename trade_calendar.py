@@ -0,0 +1,122 @@
+import os
+import datetime
+import threading
+import pandas as pd
+from tushare_cache import CACHE_ROOT
+from tushare_client import get_pro_api
+
+
+# 当年及以后年份的交易日历文件超过该天数后重新拉取，防止临时休市等调整
+CURRENT_YEAR_REFRESH_DAYS = 30
+
+
+def to_date_str(date):
+    """把datetime/date/字符串统一转换为YYYYMMDD格式"""
+    if date is None:
+        return datetime.datetime.now().strftime('%Y%m%d')
+    if isinstance(date, (datetime.datetime, datetime.date)):
+        return date.strftime('%Y%m%d')
+    return str(date).replace('-', '')
+
+
+class TradeCalendar:
+    def __init__(self, pro=None, calendar_dir=None, exchange='SSE'):
+        """
+        交易日历
+        按年从trade_cal接口拉取交易日并保存到本地，之后所有日期推算都在本地完成
+        """
+        self.pro = pro or get_pro_api()
+        self.exchange = exchange
+        self.calendar_dir = calendar_dir or os.path.join(CACHE_ROOT, 'calendar')
+        os.makedirs(self.calendar_dir, exist_ok=True)
+        self._years = {}
+        self._lock = threading.Lock()
+
+    def _path(self, year):
+        return os.path.join(self.calendar_dir, f"{self.exchange}_{year}.csv")
+
+    def _load_year(self, year):
+        """读取某一年的交易日列表，本地没有或已过期时请求接口"""
+        with self._lock:
+            if year in self._years:
+                return self._years[year]
+
+            path = self._path(year)
+            is_fresh = os.path.exists(path)
+            if is_fresh and year >= datetime.datetime.now().year:
+                written_at = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+                is_fresh = (datetime.datetime.now() - written_at).days < CURRENT_YEAR_REFRESH_DAYS
+
+            if is_fresh:
+                dates = pd.read_csv(path, dtype=str)['cal_date'].tolist()
+            else:
+                df = self.pro.trade_cal(exchange=self.exchange, start_date=f"{year}0101",
+                                        end_date=f"{year}1231", is_open='1')
+                dates = sorted(df['cal_date'].astype(str).tolist()) if not df.empty else []
+                # 未来年份的日历可能尚未发布，空结果不保存
+                if dates:
+                    pd.DataFrame({'cal_date': dates}).to_csv(path, index=False)
+
+            self._years[year] = dates
+            return dates
+
+    def trade_dates(self, start_date, end_date):
+        """返回[start_date, end_date]之间的所有交易日（升序）"""
+        start_str, end_str = to_date_str(start_date), to_date_str(end_date)
+        dates = []
+        for year in range(int(start_str[:4]), int(end_str[:4]) + 1):
+            dates.extend(d for d in self._load_year(year) if start_str <= d <= end_str)
+        return dates
+
+    def is_trade_date(self, date):
+        """判断是否为交易日"""
+        date_str = to_date_str(date)
+        return date_str in self._load_year(int(date_str[:4]))
+
+    def latest_trade_date(self, date=None):
+        """返回不晚于date的最近一个交易日，默认为今天"""
+        return self.previous_sessions(1, date)[-1]
+
+    def previous_sessions(self, n, end_date=None):
+        """返回截止到end_date（含）的最近n个交易日（升序）"""
+        end_str = to_date_str(end_date)
+        year = int(end_str[:4])
+        sessions = [d for d in self._load_year(year) if d <= end_str]
+        # 跨年时继续向前一年补足
+        while len(sessions) < n:
+            year -= 1
+            earlier = self._load_year(year)
+            if not earlier:
+                break
+            sessions = earlier + sessions
+        if not sessions:
+            raise ValueError(f"交易日历中找不到 {end_str} 之前的交易日")
+        return sessions[-n:]
+
+    def shift(self, date, n):
+        """从date所在（或之前最近）的交易日起，向后(n>0)或向前(n<0)移动n个交易日"""
+        if n <= 0:
+            return self.previous_sessions(1 - n, date)[0]
+        date_str = self.latest_trade_date(date)
+        year = int(date_str[:4])
+        following = [d for d in self._load_year(year) if d > date_str]
+        while len(following) < n:
+            year += 1
+            later = self._load_year(year)
+            if not later:
+                raise ValueError(f"交易日历中 {date_str} 之后不足 {n} 个交易日")
+            following += later
+        return following[n - 1]
+
+
+_shared_calendar = None
+_shared_calendar_lock = threading.Lock()
+
+
+def get_trade_calendar():
+    """获取进程内共享的交易日历"""
+    global _shared_calendar
+    with _shared_calendar_lock:
+        if _shared_calendar is None:
+            _shared_calendar = TradeCalendar()
+        return _shared_calendar
@@ -0,0 +1,263 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+import datetime
+import pandas as pd
+
+
+# 本地缓存根目录，可以通过环境变量STOCK_CACHE_DIR修改
+CACHE_ROOT = os.environ.get('STOCK_CACHE_DIR',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+# 各接口的缓存策略：
+# 'report_period' - 财报类数据，只在财报披露期内每日刷新，非披露期一直有效到下一个披露期开始
+# 'trade_day'     - 行情类数据，每个交易日失效；查询历史日期的数据永久有效
+# 整数            - 固定的有效秒数
+ENDPOINT_TTL = {
+    'income': 'report_period',
+    'cashflow': 'report_period',
+    'fina_indicator': 'report_period',
+    'fina_mainbz': 'report_period',
+    'top10_holders': 'report_period',
+    'daily_basic': 'trade_day',
+    'stock_company': 30 * 24 * 3600,
+    'stk_managers': 7 * 24 * 3600,
+    'stock_basic': 24 * 3600,
+}
+
+# 按日期区间查询的财报类接口及其区间过滤的日期列（利润表等按公告日期，主营构成和前十大股东按报告期）
+# 这些接口的缓存键不包含start_date/end_date，每天移动的查询区间也能命中同一份缓存，读取后再按区间过滤；
+# 数据何时过期仍由ENDPOINT_TTL决定
+DATE_WINDOW_COLUMNS = {
+    'income': 'ann_date',
+    'cashflow': 'ann_date',
+    'fina_indicator': 'ann_date',
+    'fina_mainbz': 'end_date',
+    'top10_holders': 'end_date',
+}
+DATE_WINDOW_PARAMS = ('start_date', 'end_date')
+
+# A股定期报告披露窗口（月, 日）：年报和一季报1月1日-4月30日，半年报7月1日-8月31日，三季报10月1日-10月31日
+REPORT_WINDOWS = [((1, 1), (4, 30)), ((7, 1), (8, 31)), ((10, 1), (10, 31))]
+
+
+def _next_midnight(now):
+    """返回下一个零点的时间"""
+    return datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+
+
+def in_report_window(now=None):
+    """判断当前是否处于定期报告披露窗口内"""
+    now = now or datetime.datetime.now()
+    for (start_month, start_day), (end_month, end_day) in REPORT_WINDOWS:
+        start = datetime.date(now.year, start_month, start_day)
+        end = datetime.date(now.year, end_month, end_day)
+        if start <= now.date() <= end:
+            return True
+    return False
+
+
+def next_report_refresh(now=None):
+    """
+    计算财报类数据的失效时间
+    披露窗口内新财报随时可能发布，缓存到当天结束；窗口外缓存到下一个披露窗口开始
+    """
+    now = now or datetime.datetime.now()
+    if in_report_window(now):
+        return _next_midnight(now)
+    starts = [datetime.datetime(now.year, month, day) for (month, day), _ in REPORT_WINDOWS]
+    starts.append(datetime.datetime(now.year + 1, 1, 1))
+    return min(start for start in starts if start > now)
+
+
+def compute_expiry(policy, params, data, now=None):
+    """
+    根据缓存策略计算失效时间
+    返回None表示永久有效，返回False表示不应该写入缓存
+    """
+    now = now or datetime.datetime.now()
+    if isinstance(policy, (int, float)):
+        return now + datetime.timedelta(seconds=policy)
+    if policy == 'report_period':
+        return next_report_refresh(now)
+    if policy == 'trade_day':
+        today_str = now.strftime('%Y%m%d')
+        query_date = params.get('trade_date') or params.get('end_date')
+        if query_date and str(query_date) < today_str:
+            # 历史日期的行情不会再变化
+            return None
+        if data is None or len(data) == 0:
+            # 当天数据可能尚未发布，空结果不缓存
+            return False
+        if 'trade_date' in data.columns and str(data['trade_date'].max()) < min(str(query_date or today_str), today_str):
+            # 区间查询中最新一天的数据尚未发布，不缓存
+            return False
+        return _next_midnight(now)
+    raise ValueError(f"未知的缓存策略: {policy}")
+
+
+class TushareCache:
+    def __init__(self, cache_dir=None, ttl=None):
+        """
+        初始化本地缓存
+        以(接口名, 参数)为键，把Tushare返回的DataFrame保存到磁盘
+        """
+        self.cache_dir = cache_dir or os.path.join(CACHE_ROOT, 'tushare')
+        self.ttl = dict(ENDPOINT_TTL)
+        if ttl:
+            self.ttl.update(ttl)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def has_policy(self, endpoint):
+        """判断接口是否配置了缓存策略"""
+        return endpoint in self.ttl
+
+    def make_key(self, endpoint, params):
+        """
+        由接口名和参数生成缓存键
+        按日期区间查询的财报类接口不把区间计入缓存键
+        """
+        if endpoint in DATE_WINDOW_COLUMNS:
+            params = {name: value for name, value in params.items() if name not in DATE_WINDOW_PARAMS}
+        raw = json.dumps({'endpoint': endpoint, 'params': params}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _filter_window(endpoint, cached_params, params, data):
+        """
+        按本次查询的日期区间过滤缓存的数据
+        缓存的查询区间开始得比本次晚时数据不完整，返回None按未命中处理
+        """
+        column = DATE_WINDOW_COLUMNS.get(endpoint)
+        if column is None:
+            return data
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
+        cached_start = cached_params.get('start_date')
+        if cached_start is not None and (start_date is None or str(start_date) < str(cached_start)):
+            return None
+        if column not in data.columns:
+            return data
+        dates = data[column].astype(str)
+        mask = pd.Series(True, index=data.index)
+        if start_date is not None:
+            mask &= dates >= str(start_date)
+        if end_date is not None:
+            mask &= dates <= str(end_date)
+        return data[mask]
+
+    def _path(self, endpoint, key):
+        return os.path.join(self.cache_dir, endpoint, f"{key}.pkl")
+
+    def _count(self, endpoint, field):
+        with self._lock:
+            endpoint_stats = self._stats.setdefault(endpoint, {'hits': 0, 'misses': 0})
+            endpoint_stats[field] += 1
+
+    def get(self, endpoint, params):
+        """读取缓存，未命中或已失效时返回None"""
+        path = self._path(endpoint, self.make_key(endpoint, params))
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self._count(endpoint, 'misses')
+            return None
+
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and expires_at <= datetime.datetime.now():
+            self._count(endpoint, 'misses')
+            return None
+
+        data = self._filter_window(endpoint, entry.get('params', {}), params, entry['data'])
+        if data is None:
+            self._count(endpoint, 'misses')
+            return None
+
+        self._count(endpoint, 'hits')
+        return data.copy()
+
+    def set(self, endpoint, params, data):
+        """写入缓存，先写临时文件再替换，避免并发读到不完整的文件"""
+        expires_at = compute_expiry(self.ttl[endpoint], params, data)
+        if expires_at is False:
+            return
+        path = self._path(endpoint, self.make_key(endpoint, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            'endpoint': endpoint,
+            'params': params,
+            'created_at': datetime.datetime.now(),
+            'expires_at': expires_at,
+            'data': data,
+        }
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def fetch(self, endpoint, params, loader):
+        """优先读取缓存，未命中时调用loader获取数据并写入缓存"""
+        data = self.get(endpoint, params)
+        if data is not None:
+            return data
+        data = loader()
+        self.set(endpoint, params, data)
+        return data
+
+    def get_stats(self):
+        """返回各接口的命中/未命中次数"""
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+
+    def print_stats(self):
+        """打印缓存命中统计"""
+        stats = self.get_stats()
+        if not stats:
+            print("Tushare缓存统计: 暂无调用")
+            return
+        total_hits = sum(counts['hits'] for counts in stats.values())
+        total_misses = sum(counts['misses'] for counts in stats.values())
+        print(f"Tushare缓存统计: 命中 {total_hits} 次, 未命中 {total_misses} 次")
+        for endpoint, counts in sorted(stats.items()):
+            print(f"  {endpoint}: 命中 {counts['hits']} 次, 未命中 {counts['misses']} 次")
+
+
+class CachedProApi:
+    def __init__(self, pro, cache=None):
+        """
+        包装tushare的pro_api对象，调用方式与pro_api完全相同
+        配置了缓存策略的接口先查本地缓存，其余接口直接透传
+        """
+        self._pro = pro
+        self.cache = cache or get_default_cache()
+
+    def query(self, api_name, fields='', **kwargs):
+        if not self.cache.has_policy(api_name):
+            return self._pro.query(api_name, fields=fields, **kwargs)
+        params = dict(kwargs)
+        params['fields'] = fields
+        return self.cache.fetch(api_name, params,
+                                lambda: self._pro.query(api_name, fields=fields, **kwargs))
+
+    def __getattr__(self, name):
+        def call(fields='', **kwargs):
+            return self.query(name, fields=fields, **kwargs)
+        return call
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """获取进程内共享的缓存实例，便于跨股票累计命中统计"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TushareCache()
+        return _default_cache
@@ -0,0 +1,126 @@
+import os
+import time
+import random
+import threading
+import requests
+import tushare as ts
+from rate_limiter import TokenBucket
+
+
+# 默认每个接口每分钟最多调用次数（与账户积分对应），可以通过环境变量TUSHARE_RATE_LIMIT修改
+DEFAULT_RATE_PER_MINUTE = int(os.environ.get('TUSHARE_RATE_LIMIT', 200))
+
+# 个别接口的每分钟调用上限，未列出的接口使用默认值
+ENDPOINT_RATE_LIMITS = {
+    'stk_managers': 100,
+    'income_vip': 60,
+    'cashflow_vip': 60,
+    'fina_indicator_vip': 60,
+}
+
+# 同时在途的请求数上限
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('TUSHARE_MAX_CONCURRENCY', 8))
+
+# 单次调用的最大重试次数和退避基数（秒）
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+# Tushare超出频率限制时返回的错误信息关键字
+QUOTA_ERROR_KEYWORDS = ['最多访问', '访问频率', '频次', 'too many requests']
+
+
+def is_quota_error(error):
+    """判断异常是否为接口频率超限"""
+    message = str(error).lower()
+    return any(keyword in message for keyword in QUOTA_ERROR_KEYWORDS)
+
+
+class RateLimitedProApi:
+    def __init__(self, pro, default_rate=DEFAULT_RATE_PER_MINUTE, endpoint_rates=None,
+                 max_concurrency=MAX_CONCURRENT_REQUESTS, max_retries=MAX_RETRIES):
+        """
+        带限流和重试的Tushare客户端，调用方式与pro_api完全相同
+        每个接口一个令牌桶，同时限制在途请求数，频率超限时指数退避重试
+        """
+        self._pro = pro
+        self.default_rate = default_rate
+        self.endpoint_rates = dict(ENDPOINT_RATE_LIMITS)
+        if endpoint_rates:
+            self.endpoint_rates.update(endpoint_rates)
+        self.max_retries = max_retries
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'throttled_seconds': 0.0}
+
+    def _bucket(self, api_name):
+        with self._buckets_lock:
+            if api_name not in self._buckets:
+                rate = self.endpoint_rates.get(api_name, self.default_rate)
+                self._buckets[api_name] = TokenBucket(rate)
+            return self._buckets[api_name]
+
+    def _count(self, field, value=1):
+        with self._stats_lock:
+            self._stats[field] += value
+
+    def query(self, api_name, fields='', **kwargs):
+        bucket = self._bucket(api_name)
+        for attempt in range(self.max_retries + 1):
+            self._count('throttled_seconds', bucket.acquire())
+            try:
+                with self._semaphore:
+                    self._count('requests')
+                    return self._pro.query(api_name, fields=fields, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except Exception as e:
+                if not is_quota_error(e):
+                    raise
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            # 指数退避，加入随机抖动避免并发线程同时重试
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.8, 1.2)
+            print(f"Tushare接口 {api_name} 调用受限({error})，{delay:.1f} 秒后第 {attempt + 1} 次重试...")
+            self._count('retries')
+            time.sleep(delay)
+
+    def __getattr__(self, name):
+        def call(fields='', **kwargs):
+            return self.query(name, fields=fields, **kwargs)
+        return call
+
+    def get_stats(self):
+        """返回请求次数、重试次数和限流等待时间"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def print_stats(self):
+        """打印限流统计"""
+        stats = self.get_stats()
+        print(f"Tushare请求统计: 请求 {stats['requests']} 次, 重试 {stats['retries']} 次, "
+              f"限流等待 {stats['throttled_seconds']:.1f} 秒")
+
+
+_shared_pro = None
+_shared_pro_lock = threading.Lock()
+
+
+def get_pro_api():
+    """
+    获取进程内共享的Tushare客户端
+    所有模块共用同一组令牌桶，批量并发运行时不会超出账户的访问频率
+    """
+    global _shared_pro
+    with _shared_pro_lock:
+        if _shared_pro is None:
+            token = os.environ.get('TUSHARE_TOKEN')
+            if not token:
+                raise ValueError("TUSHARE_TOKEN环境变量未设置")
+            ts.set_token(token)
+            _shared_pro = RateLimitedProApi(ts.pro_api(token))
+        return _shared_pro